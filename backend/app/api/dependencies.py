@@ -0,0 +1,95 @@
+"""Shared FastAPI dependencies for the API routes."""
+
+import math
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.rate_limit import TokenBucketLimiter
+from app.core.security import is_valid_short_code
+from app.database import get_db
+from app.services.analytics_service import AnalyticsService
+from app.services.auth_service import AuthService
+from app.services.url_service import URLService
+
+# Top-level paths that should not be treated as short codes
+RESERVED_PATHS = frozenset({
+    "api", "health", "robots.txt",
+    "favicon.ico", "static", "assets",
+    "sitemap.xml", ".well-known", "docs", "redoc", "openapi.json",
+})
+
+_redirect_limiter = TokenBucketLimiter(
+    capacity=settings.RATE_LIMIT_REQUESTS, window=settings.RATE_LIMIT_WINDOW
+)
+
+
+async def get_url_service(db: Session = Depends(get_db)) -> URLService:
+    """Provide a URLService bound to the request's database session."""
+    return URLService(db)
+
+
+async def get_analytics_service(db: Session = Depends(get_db)) -> AnalyticsService:
+    """Provide an AnalyticsService bound to the request's database session."""
+    return AnalyticsService(db)
+
+
+async def get_auth_service(db: Session = Depends(get_db)) -> AuthService:
+    """Provide an AuthService bound to the request's database session."""
+    return AuthService(db)
+
+
+async def valid_short_code(short_code: str) -> str:
+    """
+    Validate the short_code path parameter before touching the database.
+    
+    Declare it ahead of other dependencies so malformed codes are rejected
+    with 404 before a session or user lookup is resolved.
+    """
+    if not is_valid_short_code(short_code):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Short code '{short_code}' not found",
+        )
+    return short_code
+
+
+async def redirect_short_code(short_code: str) -> str:
+    """
+    Validate the short_code of the top-level redirect route.
+    
+    Declared ahead of the service dependency, so crawler probes for
+    reserved or malformed paths get a 404 without opening a session.
+    """
+    if short_code.lower() in RESERVED_PATHS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Path '/{short_code}' is reserved and cannot be used as a short code",
+        )
+    
+    if not is_valid_short_code(short_code):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Short code '{short_code}' not found or expired",
+        )
+    return short_code
+
+
+async def rate_limit_by_ip(request: Request) -> None:
+    """
+    Throttle clients that exceed RATE_LIMIT_REQUESTS per RATE_LIMIT_WINDOW.
+    
+    A no-op unless RATE_LIMIT_ENABLED. Keyed by the peer address, so run
+    behind a proxy with forwarded headers trusted (uvicorn --proxy-headers).
+    """
+    if not settings.RATE_LIMIT_ENABLED or request.client is None:
+        return
+    
+    retry_after = _redirect_limiter.acquire(request.client.host)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
@@ -1,22 +1,25 @@
 """Analytics API routes."""
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 
-from app.database import get_db
+from app.api.dependencies import get_analytics_service, valid_short_code
 from app.schemas.analytics import AnalyticsResponse, AnalyticsSummaryResponse
 from app.services.analytics_service import AnalyticsService
 from app.core.exceptions import URLNotFoundError
 from app.core.auth import get_current_user
+from app.core.http_cache import cached_json_response
 from app.models.user import User
 
 router = APIRouter()
 
 
 @router.get("/{short_code}/summary", response_model=AnalyticsSummaryResponse)
-def get_analytics_summary(
-    short_code: str,
-    db: Session = Depends(get_db),
+async def get_analytics_summary(
+    request: Request,
+    short_code: str = Depends(valid_short_code),
+    service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -31,12 +34,14 @@ def get_analytics_summary(
     - Clicks by date
     - Top referers
     - Clicks by hour of day
-    """
-    service = AnalyticsService(db)
     
+    Supports conditional requests via ETag / If-None-Match.
+    """
     try:
         # Verify user owns the URL
-        url = service.url_repository.get_by_short_code(short_code, include_inactive=True)
+        url = await run_in_threadpool(
+            service.url_repository.get_by_short_code, short_code, include_inactive=True
+        )
         if not url:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -50,8 +55,8 @@ def get_analytics_summary(
                 detail="You don't have permission to view analytics for this URL",
             )
         
-        result = service.get_analytics_summary(short_code)
-        return AnalyticsSummaryResponse(**result)
+        result = await run_in_threadpool(service.get_analytics_summary_for_url, url)
+        return cached_json_response(request, result, cache_control="private, max-age=30")
     except URLNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -60,10 +65,10 @@ def get_analytics_summary(
 
 
 @router.get("/{short_code}/clicks", response_model=list[AnalyticsResponse])
-def get_recent_clicks(
-    short_code: str,
+async def get_recent_clicks(
+    short_code: str = Depends(valid_short_code),
     limit: int = 50,
-    db: Session = Depends(get_db),
+    service: AnalyticsService = Depends(get_analytics_service),
     current_user: User = Depends(get_current_user),
 ):
     """
@@ -79,11 +84,11 @@ def get_recent_clicks(
             detail="Limit must be between 1 and 500",
         )
     
-    service = AnalyticsService(db)
-    
     try:
         # Verify user owns the URL
-        url = service.url_repository.get_by_short_code(short_code, include_inactive=True)
+        url = await run_in_threadpool(
+            service.url_repository.get_by_short_code, short_code, include_inactive=True
+        )
         if not url:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -97,8 +102,9 @@ def get_recent_clicks(
                 detail="You don't have permission to view analytics for this URL",
             )
         
-        result = service.get_recent_clicks(short_code, limit=limit)
-        return [AnalyticsResponse(**r) for r in result]
+        result = await run_in_threadpool(service.get_recent_clicks_for_url, url, limit=limit)
+        # Rows already match AnalyticsResponse; skip per-row model validation
+        return ORJSONResponse(result)
     except URLNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,9 +1,9 @@
 """Authentication API routes."""
 
 from fastapi import APIRouter, Depends, HTTPException, status, Form
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 
-from app.database import get_db
+from app.api.dependencies import get_auth_service
 from app.schemas.auth import UserRegister, UserResponse, Token
 from app.services.auth_service import AuthService
 from app.core.auth import get_current_user
@@ -13,9 +13,9 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
-def register(
+async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db),
+    service: AuthService = Depends(get_auth_service),
 ):
     """
     Register a new user account.
@@ -24,18 +24,17 @@ def register(
     - **username**: Username (3-100 characters, must be unique)
     - **password**: Password (minimum 8 characters)
     """
-    service = AuthService(db)
-    
     try:
-        result = service.register_user(
+        result = await run_in_threadpool(
+            service.register_user,
             email=user_data.email,
             username=user_data.username,
             password=user_data.password,
         )
-        return Token(
+        return Token.model_construct(
             access_token=result["access_token"],
             token_type=result["token_type"],
-            user=UserResponse(**result["user"])
+            user=UserResponse.model_construct(**result["user"]),
         )
     except ValueError as e:
         raise HTTPException(
@@ -45,10 +44,10 @@ def register(
 
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db),
+    service: AuthService = Depends(get_auth_service),
 ):
     """
     Login with username and password.
@@ -56,17 +55,16 @@ def login(
     Returns an access token for authenticated requests.
     Uses form data (application/x-www-form-urlencoded) for OAuth2 compatibility.
     """
-    service = AuthService(db)
-    
     try:
-        result = service.login_user(
+        result = await run_in_threadpool(
+            service.login_user,
             username=username,
             password=password,
         )
-        return Token(
+        return Token.model_construct(
             access_token=result["access_token"],
             token_type=result["token_type"],
-            user=UserResponse(**result["user"])
+            user=UserResponse.model_construct(**result["user"]),
         )
     except ValueError as e:
         raise HTTPException(
@@ -77,13 +75,13 @@ def login(
 
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(
+async def get_current_user_info(
     current_user: User = Depends(get_current_user),
 ):
     """
     Get current authenticated user information.
     """
-    return UserResponse(
+    return UserResponse.model_construct(
         id=current_user.id,
         email=current_user.email,
         username=current_user.username,
@@ -1,30 +1,37 @@
 """URL shortening API routes."""
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from typing import Optional
-from datetime import datetime
 import logging
+import time
+import orjson
 
-from app.database import get_db
+from app.api.dependencies import get_url_service, valid_short_code
 from app.schemas.url import URLCreate, URLResponse, URLStatsResponse, URLListResponse
 from app.services.url_service import URLService
 from app.services.qr_service import QRService
 from app.core.exceptions import (
+    InvalidCursorError,
     InvalidURLError,
     ShortCodeGenerationError,
     URLNotFoundError,
 )
 from app.core.auth import get_current_user, get_current_user_optional
+from app.core.http_cache import cached_json_response, cached_response
 from app.models.user import User
 
 router = APIRouter()
 logger = logging.getLogger(__name__)  
 
+# QRService holds no per-request state, so one instance serves every request
+_qr_service = QRService()
+
 @router.post("/", response_model=URLResponse, status_code=status.HTTP_201_CREATED)
-def create_short_url(
+async def create_short_url(
     url_data: URLCreate,
-    db: Session = Depends(get_db),
+    service: URLService = Depends(get_url_service),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
     """
@@ -36,16 +43,16 @@ def create_short_url(
     - **custom_code**: Optional custom short code (4-20 alphanumeric characters)
     - **expires_in_days**: Optional expiration in days (1-365)
     """
-    service = URLService(db)
-    
     try:
-        result = service.create_short_url(
+        result = await run_in_threadpool(
+            service.create_short_url,
             original_url=url_data.original_url,
             custom_code=url_data.custom_code,
             expires_in_days=url_data.expires_in_days,
             user=current_user,
         )
-        return URLResponse(**result)
+        # Service output is already shaped to the schema; skip re-validation
+        return URLResponse.model_construct(**result)
     except InvalidURLError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -58,31 +65,43 @@ def create_short_url(
         ) from e
 
 
+# Declared before /{short_code}; the dot keeps it from ever shadowing a
+# (strictly alphanumeric) short code
+@router.get("/export.ndjson", response_class=StreamingResponse)
+async def export_urls(
+    service: URLService = Depends(get_url_service),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Export all of the authenticated user's active URLs as NDJSON.
+    Requires authentication.
+    
+    One URLResponse-shaped JSON object per line, newest first. Rows are
+    streamed from the database in batches, so large exports don't build
+    the whole list in memory.
+    """
+    rows = service.iter_urls(user=current_user)
+    # Sync iterator: Starlette pulls each line on a worker thread
+    lines = (orjson.dumps(row) + b"\n" for row in rows)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.get("/{short_code}", response_model=URLResponse)
-def get_url_info(
-    short_code: str,
-    db: Session = Depends(get_db),
+async def get_url_info(
+    request: Request,
+    short_code: str = Depends(valid_short_code),
+    service: URLService = Depends(get_url_service),
 ):
     """
     Get information about a shortened URL.
+    Supports conditional requests via ETag / If-None-Match.
     
     - **short_code**: The short code to look up
     """
-    service = URLService(db)
-    
     try:
-        result = service.get_url_stats(short_code)
-        # Convert to URLResponse format
-        return URLResponse(
-            id=result["id"],
-            short_code=result["short_code"],
-            original_url=result["original_url"],
-            short_url=result["short_url"],
-            created_at=result["created_at"],
-            expires_at=result["expires_at"],
-            is_active=result["is_active"],
-            click_count=result["total_clicks"],
-        )
+        result = await run_in_threadpool(service.get_url_stats, short_code)
+        # Already shaped like URLResponse; serialized straight to JSON
+        return cached_json_response(request, result, cache_control="private, max-age=30")
     except URLNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -91,18 +110,26 @@ def get_url_info(
 
 
 @router.get("/", response_model=URLListResponse)
-def list_urls(
-    page: int = 1,
+async def list_urls(
+    page: int = Query(default=1, deprecated=True, description="Page number; prefer cursor"),
     page_size: int = 20,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    include_total: bool = Query(default=True, description="Count all matching URLs"),
+    service: URLService = Depends(get_url_service),
     current_user: User = Depends(get_current_user),
 ):
     """
     List shortened URLs with pagination.
     Requires authentication - only shows URLs created by the authenticated user.
     
-    - **page**: Page number (default: 1)
+    - **page**: Page number (default: 1). Deprecated: OFFSET paging gets slower
+      with depth; follow `next_cursor` instead
     - **page_size**: Number of items per page (default: 20, max: 100)
+    - **cursor**: `next_cursor` from the previous page; takes precedence over page.
+      Cursor pages return `page: null`, and `total_approximate: true` because
+      their total may be up to URL_LIST_COUNT_CACHE_TTL seconds old
+    - **include_total**: Set to false to skip counting; `total` and
+      `total_pages` are then null and `has_next` tells whether more follow
     """
     
     if page < 1:
@@ -117,28 +144,45 @@ def list_urls(
             detail="Page size must be between 1 and 100",
         )
     
-    service = URLService(db)
-    result = service.list_urls(page=page, page_size=page_size, user=current_user)
-    return URLListResponse(**result)
+    try:
+        result = await run_in_threadpool(
+            service.list_urls,
+            page=page,
+            page_size=page_size,
+            user=current_user,
+            cursor=cursor,
+            include_total=include_total,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        ) from e
+    # The service already returns the URLListResponse shape; skip re-validation
+    return ORJSONResponse(result)
 
 
 @router.delete("/{short_code}", status_code=status.HTTP_204_NO_CONTENT)
-def deactivate_url(
-    short_code: str,
-    db: Session = Depends(get_db),
+async def deactivate_url(
+    short_code: str = Depends(valid_short_code),
+    service: URLService = Depends(get_url_service),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ):
     """
     Deactivate a shortened URL.
     Requires authentication - you can only deactivate URLs you own.
     
+    Takes effect eventually: workers other than the one handling this
+    request may keep redirecting for up to REDIRECT_CACHE_TTL seconds and
+    serving info and QR codes for up to URL_CACHE_TTL seconds (5 by default).
+    
     - **short_code**: The short code to deactivate
     """
-    service = URLService(db)
-    
     try:
         # Verify user owns the URL
-        url = service.url_repository.get_by_short_code(short_code, include_inactive=True)
+        url = await run_in_threadpool(
+            service.url_repository.get_by_short_code, short_code, include_inactive=True
+        )
         if not url:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -150,7 +194,7 @@ def deactivate_url(
                 detail="You don't have permission to deactivate this URL",
             )
         
-        service.deactivate_url(short_code)
+        await run_in_threadpool(service.deactivate_url_obj, url)
     except URLNotFoundError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,11 +203,12 @@ def deactivate_url(
 
 @router.get("/{short_code}/qr", response_class=Response)
 async def get_qr_code(
-    short_code: str,
+    request: Request,
+    short_code: str = Depends(valid_short_code),
     size: int = Query(default=400, ge=100, le=1000, description="The size of the QR code in pixels (100-1000)"),
     error_correction: str = Query(default="M", regex="^[LMQHlmqh]$", description="The error correction level (L, M, Q, H)"),
     border: int = Query(4, ge=1, le=10, description="The border size in boxes (1-10)"),
-    db: Session = Depends(get_db),
+    service: URLService = Depends(get_url_service),
     current_user: Optional[User] = Depends(get_current_user_optional),
 ) -> Response:
     """
@@ -174,16 +219,16 @@ async def get_qr_code(
     - **error_correction**: Error correction level - L, M, Q, or H (default: M)
     - **border**: Border size in boxes (default: 4, min: 1, max: 10)
     
-    Returns PNG image that can be displayed or downloaded.
+    Returns PNG image that can be displayed or downloaded. Responses carry an
+    ETag; a matching If-None-Match gets 304 Not Modified with no body.
     """
     
-    service = URLService(db)
-    qr_service = QRService()
-    
     try:
         # 1. Validate short code exists and is active
         try:
-            url_info = service.get_url_stats(short_code)
+            url_info, expires_at_epoch = await run_in_threadpool(
+                service.get_url_stats_with_expiry, short_code
+            )
         except URLNotFoundError as e:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -198,8 +243,8 @@ async def get_qr_code(
             )
         
         # 3. Check if URL is expired
-        if url_info["expires_at"]:
-            if url_info["expires_at"] < datetime.utcnow():
+        if expires_at_epoch is not None:
+            if expires_at_epoch < time.time():
                 raise HTTPException(
                     status_code=status.HTTP_410_GONE,
                     detail=f"Short code '{short_code}' has expired",
@@ -207,9 +252,6 @@ async def get_qr_code(
         
         # 4. Get short URL
         short_url = url_info["short_url"]
-
-        # 4. Get short URL
-        short_url = url_info["short_url"]
         
         # 5. Validate URL is not empty
         if not short_url or not short_url.strip():
@@ -220,8 +262,10 @@ async def get_qr_code(
             )
         
         # 6. Generate QR code with error handling
+        # PNG encoding is CPU-bound; keep it off the event loop
         try:
-            qr_bytes = qr_service.generate_qr_code(
+            qr_bytes = await run_in_threadpool(
+                _qr_service.generate_qr_code,
                 url=short_url,
                 size=size,
                 error_correction=error_correction.upper(),
@@ -250,15 +294,18 @@ async def get_qr_code(
                 detail="Failed to generate QR code. Please try again later.",
             )
         
-        # 8. Return successful response
-        return Response(
-            content=qr_bytes,
+        # 8. Return the image, or 304 if the client's ETag still matches.
+        # The memoized PNG bytes object is handed to Starlette as-is, so no
+        # copy is made per request.
+        return cached_response(
+            request,
+            qr_bytes,
             media_type="image/png",
+            cache_control="public, max-age=3600",  # Cache for 1 hour
             headers={
                 "Content-Disposition": f'inline; filename="qr-{short_code}.png"',
-                "Cache-Control": "public, max-age=3600",  # Cache for 1 hour
                 "Content-Length": str(len(qr_bytes)),
-            }
+            },
         )
         
     except HTTPException:
@@ -1,9 +1,14 @@
 """Application configuration management."""
 
+import logging
 import os
-import warnings
+from functools import lru_cache
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import Field, field_validator
+from pydantic import Field, model_validator
+
+
+logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
@@ -20,6 +25,33 @@ class Settings(BaseSettings):
         description="Database connection URL. Use PostgreSQL in production."
     )
     DATABASE_ECHO: bool = False
+    DATABASE_QUERY_CACHE_SIZE: int = Field(
+        default=1200,
+        description="Compiled statements cached per engine (SQLAlchemy default is 500)."
+    )
+    # Connection pool (ignored for SQLite). Sized so pool_size + max_overflow
+    # covers the request threadpool (THREADPOOL_SIZE) without queueing.
+    DATABASE_POOL_SIZE: int = 20
+    DATABASE_MAX_OVERFLOW: int = 40
+    DATABASE_POOL_RECYCLE: int = Field(
+        default=1800,
+        description="Seconds before a pooled connection is replaced. Guards against server-side idle timeouts."
+    )
+    DATABASE_POOL_TIMEOUT: int = Field(
+        default=30,
+        description="Seconds to wait for a free pooled connection before failing."
+    )
+    DATABASE_POOL_DISABLED: bool = Field(
+        default=False,
+        description="Open a connection per session (NullPool). Use behind PgBouncer in transaction mode."
+    )
+    DATABASE_POOL_PRE_PING: bool = Field(
+        default=False,
+        description="Ping connections on checkout. Costs a round trip per request; enable if the database drops idle connections sooner than DATABASE_POOL_RECYCLE."
+    )
+
+    # Worker threads for run_in_threadpool (blocking DB and service calls)
+    THREADPOOL_SIZE: int = 40
 
     # API
     API_V1_PREFIX: str = "/api/v1"
@@ -43,10 +75,63 @@ class Settings(BaseSettings):
         default="dev-secret-key-change-in-production",
         description="Secret key for security. MUST be set in production via environment variable."
     )
+    PASSWORD_HASH_WORKERS: int = Field(
+        default=1,
+        description="Password hashing processes per web worker, each using up to ~19 MiB for argon2. 0 hashes inline."
+    )
     SHORT_CODE_LENGTH: int = 8
     MAX_URL_LENGTH: int = 2048
 
-    # Rate Limiting (for future implementation)
+    # Caching (in-process, per worker)
+    URL_CACHE_SIZE: int = 10_000
+    URL_CACHE_TTL: int = Field(
+        default=5,
+        description="Seconds a cached URL lookup may be served before re-reading the database. Bounds how long other workers keep serving a deactivated URL."
+    )
+    REDIRECT_CACHE_SIZE: int = 50_000
+    REDIRECT_CACHE_TTL: int = Field(
+        default=5,
+        description="Seconds a redirect target is served from memory per worker. A deactivated URL may keep redirecting on other workers for this long."
+    )
+    REDIRECT_MISS_CACHE_TTL: int = Field(
+        default=5,
+        description="Seconds an unknown short code is remembered per worker. A code created meanwhile may 404 on other workers for this long."
+    )
+    JWT_CACHE_SIZE: int = 10_000
+    JWT_CACHE_TTL: int = Field(
+        default=60,
+        description="Max seconds a decoded access token is reused without re-verifying its signature."
+    )
+    PASSWORD_VERIFY_CACHE_TTL: int = Field(
+        default=30,
+        description="Seconds a successful password check is reused for repeat logins."
+    )
+    QR_PREWARM_COUNT: int = Field(
+        default=100,
+        description="Most-clicked URLs whose default QR code is rendered at startup. 0 disables."
+    )
+    URL_LIST_COUNT_CACHE_TTL: int = Field(
+        default=30,
+        description="Seconds a user's URL count is reused when paging with a cursor."
+    )
+    URL_EXPIRY_SWEEP_INTERVAL: float = Field(
+        default=60,
+        description="Seconds between passes that mark expired URLs inactive. 0 disables."
+    )
+    EXPIRED_URL_RETENTION_DAYS: Optional[int] = Field(
+        default=None,
+        description="Days an expired URL and its clicks are kept before the expiry sweeper deletes them. Unset keeps them."
+    )
+
+    # Click tracking (batched writes from a background thread)
+    CLICK_FLUSH_BATCH_SIZE: int = 500
+    CLICK_FLUSH_INTERVAL: float = Field(
+        default=0.25,
+        description="Seconds the click writer waits for more clicks before flushing a batch."
+    )
+    CLICK_BUFFER_MAX_PENDING: int = 100_000
+
+    # Rate Limiting (per client IP on the redirect route, per worker)
     RATE_LIMIT_ENABLED: bool = False
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 60
@@ -58,79 +143,76 @@ class Settings(BaseSettings):
         extra="ignore",
     )
 
-    @field_validator("SECRET_KEY")
-    @classmethod
-    def validate_secret_key(cls, v: str, info) -> str:
-        """Validate that SECRET_KEY is set, especially in production."""
-        is_production = info.data.get("ENVIRONMENT", "development") == "production"
-        
-        if not v or v == "":
-            if is_production:
-                raise ValueError(
-                    "SECRET_KEY must be set in production. "
-                    "Set it via environment variable SECRET_KEY."
-                )
-            else:
-                warnings.warn(
-                    "SECRET_KEY is not set. Using empty string for development only. "
-                    "Set SECRET_KEY environment variable for production.",
-                    UserWarning
-                )
-        elif v == "change-this-secret-key-in-production":
-            if is_production:
-                raise ValueError(
-                    "SECRET_KEY must be changed from default value in production. "
-                    "Generate a strong random key and set it via environment variable."
-                )
-            else:
-                warnings.warn(
-                    "SECRET_KEY is using default value. Change it for production.",
-                    UserWarning
-                )
-        return v
-
-    @field_validator("BASE_URL")
-    @classmethod
-    def validate_base_url(cls, v: str, info) -> str:
-        """Warn if BASE_URL is using default in production."""
-        is_production = info.data.get("ENVIRONMENT", "development") == "production"
+    @model_validator(mode="after")
+    def check_production(self) -> "Settings":
+        """Reject a missing or placeholder SECRET_KEY in production."""
+        if self.ENVIRONMENT != "production":
+            return self
         
-        if is_production and ("localhost" in v or "127.0.0.1" in v):
-            warnings.warn(
-                f"BASE_URL is set to '{v}' which appears to be a development URL. "
-                "Set BASE_URL to your production domain via environment variable.",
-                UserWarning
+        if not self.SECRET_KEY:
+            raise ValueError(
+                "SECRET_KEY must be set in production. "
+                "Set it via environment variable SECRET_KEY."
             )
-        return v
+        if self.SECRET_KEY == "change-this-secret-key-in-production":
+            raise ValueError(
+                "SECRET_KEY must be changed from default value in production. "
+                "Generate a strong random key and set it via environment variable."
+            )
+        return self
 
-    @field_validator("ALLOWED_ORIGINS")
-    @classmethod
-    def validate_allowed_origins(cls, v: str, info) -> str:
-        """Warn if ALLOWED_ORIGINS is too permissive in production."""
-        is_production = info.data.get("ENVIRONMENT", "development") == "production"
+    def warn_if_insecure(self) -> None:
+        """
+        Warn about settings that are unsafe or development-only.
+        
+        Kept out of validation so the checks run once, at startup. Logged
+        rather than raised through the warnings machinery so they reach
+        stdout with the rest of the application logs.
+        """
+        is_production = self.ENVIRONMENT == "production"
         
-        if is_production and v == "*":
-            warnings.warn(
+        if not self.SECRET_KEY:
+            logger.warning(
+                "SECRET_KEY is not set. Using empty string for development only. "
+                "Set SECRET_KEY environment variable for production."
+            )
+        elif self.SECRET_KEY == "change-this-secret-key-in-production":
+            logger.warning(
+                "SECRET_KEY is using default value. Change it for production."
+            )
+        
+        if not is_production:
+            return
+        
+        if "localhost" in self.BASE_URL or "127.0.0.1" in self.BASE_URL:
+            logger.warning(
+                f"BASE_URL is set to '{self.BASE_URL}' which appears to be a development URL. "
+                "Set BASE_URL to your production domain via environment variable."
+            )
+        
+        if self.ALLOWED_ORIGINS == "*":
+            logger.warning(
                 "ALLOWED_ORIGINS is set to '*' which allows all origins. "
-                "Set ALLOWED_ORIGINS to specific domains in production for security.",
-                UserWarning
+                "Set ALLOWED_ORIGINS to specific domains in production for security."
             )
-        return v
-
-    @field_validator("DATABASE_URL")
-    @classmethod
-    def validate_database_url(cls, v: str, info) -> str:
-        """Warn if using SQLite in production."""
-        is_production = info.data.get("ENVIRONMENT", "development") == "production"
         
-        if is_production and v.startswith("sqlite"):
-            warnings.warn(
+        if self.DATABASE_URL.startswith("sqlite"):
+            logger.warning(
                 "DATABASE_URL is using SQLite. SQLite is not recommended for production. "
-                "Use PostgreSQL or another production database.",
-                UserWarning
+                "Use PostgreSQL or another production database."
             )
-        return v
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Return the process-wide settings, loading them on first use.
+    
+    Usable as a FastAPI dependency so tests can override it.
+    """
+    return Settings()
+
+
+# Module-level handle for code that reads settings at import time
+settings = get_settings()
 
@@ -1,27 +1,43 @@
 """Authentication and authorization utilities."""
 
+import base64
+import calendar
+import hashlib
+import hmac
 import logging
+import threading
+import time
 from datetime import datetime, timedelta
 from typing import Optional
+import orjson
+from cachetools import TLRUCache, TTLCache
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.core.hashing import check_password, hash_password, needs_rehash, run_hash
 from app.database import get_db
 from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
-# Password hashing
-# Configure bcrypt with proper settings
-pwd_context = CryptContext(
-    schemes=["bcrypt"],
-    deprecated="auto",
-    bcrypt__rounds=12,  # Number of rounds for bcrypt
+# Decoded token cache: blake2b(token) -> (user_id, exp). Entries live until
+# the token's own expiry or JWT_CACHE_TTL, whichever comes first.
+_jwt_cache: TLRUCache = TLRUCache(
+    maxsize=settings.JWT_CACHE_SIZE,
+    ttu=lambda _key, value, now: min(value[1], now + settings.JWT_CACHE_TTL),
+    timer=time.time,
 )
+_jwt_cache_lock = threading.Lock()
+
+# Successful password checks, keyed by an HMAC of the credentials and the
+# stored hash. Repeat logins within PASSWORD_VERIFY_CACHE_TTL skip hashing.
+_verify_cache: TTLCache = TTLCache(maxsize=1024, ttl=settings.PASSWORD_VERIFY_CACHE_TTL)
+_verify_cache_lock = threading.Lock()
 
 # OAuth2 scheme - auto_error=False allows optional authentication
 oauth2_scheme = OAuth2PasswordBearer(
@@ -31,16 +47,16 @@ oauth2_scheme = OAuth2PasswordBearer(
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against a hash (runs in the hashing pool)."""
+    return run_hash(check_password, plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using argon2id (runs in the hashing pool).
     
-    Bcrypt has a 72-byte limit for passwords. This function handles truncation
-    internally so callers don't need to know about bcrypt implementation details.
+    The whole password is hashed; argon2 has no length limit. Only the
+    legacy bcrypt verify path truncates (see hashing.BCRYPT_MAX_BYTES).
     
     Args:
         password: Plain text password to hash
@@ -48,34 +64,124 @@ def get_password_hash(password: str) -> str:
     Returns:
         Hashed password string
     """
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password = password_bytes[:72].decode('utf-8', errors='ignore')
-    
-    return pwd_context.hash(password)
+    return run_hash(hash_password, password)
+
+
+def _b64url(data: bytes) -> bytes:
+    """Unpadded base64url, as used for JWT segments."""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+# The header never changes, so its encoded segment is built once. The HMAC
+# is keyed once too; each token signs a copy, skipping the key setup.
+_JWT_HEADER_SEGMENT = _b64url(orjson.dumps({"alg": "HS256", "typ": "JWT"}))
+_jwt_signer = hmac.new(settings.SECRET_KEY.encode(), digestmod=hashlib.sha256)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token."""
+    """
+    Create a JWT access token.
+    
+    Encodes HS256 directly (orjson claims plus a pre-keyed HMAC-SHA256)
+    rather than through jose's generic JWS path; tokens are standard and
+    decode with jwt.decode as before.
+    """
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
-    # SECRET_KEY is required, validated in config
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+    # Same NumericDate jose writes for a naive UTC datetime
+    to_encode.update({"exp": calendar.timegm(expire.utctimetuple())})
+    
+    signing_input = _JWT_HEADER_SEGMENT + b"." + _b64url(orjson.dumps(to_encode))
+    signer = _jwt_signer.copy()
+    signer.update(signing_input)
+    return (signing_input + b"." + _b64url(signer.digest())).decode("ascii")
 
 
+def decode_user_id(token: str) -> Optional[int]:
+    """
+    Return the user ID from a valid access token, or None.
+    
+    Signature checks and JSON parsing are skipped for tokens seen recently;
+    a cached entry never outlives the token's exp claim.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(key)
+    if cached is not None:
+        return cached[0]
+    
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+    
+    # Convert string back to integer (JWT 'sub' must be string)
+    try:
+        user_id = int(payload.get("sub"))
+    except (ValueError, TypeError):
+        return None
+    
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        with _jwt_cache_lock:
+            _jwt_cache[key] = (user_id, exp)
+    return user_id
+
+
+# User lookups are built with lambda_stmt: SQLAlchemy caches the statement
+# per call site and only re-binds the closure values, skipping construction
+# and cache-key generation on every request
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get a user by username."""
-    return db.query(User).filter(User.username == username).first()
+    stmt = lambda_stmt(lambda: select(User).where(User.username == username))
+    return db.execute(stmt).scalar_one_or_none()
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """Get a user by email."""
-    return db.query(User).filter(User.email == email).first()
+    stmt = lambda_stmt(lambda: select(User).where(User.email == email))
+    return db.execute(stmt).scalar_one_or_none()
+
+
+def get_active_user_by_id(db: Session, user_id: int) -> Optional[User]:
+    """Get an active user by ID, or None if missing or deactivated."""
+    stmt = lambda_stmt(lambda: select(User).where(User.id == user_id))
+    user = db.execute(stmt).scalar_one_or_none()
+    if user is None or not user.is_active:
+        return None
+    return user
+
+
+def _verify_password_cached(username: str, password: str, hashed_password: str) -> bool:
+    """
+    Verify a password, reusing a recent successful check for the same credentials.
+    
+    The key is an HMAC under SECRET_KEY, so cache contents can't be turned
+    back into passwords. It includes the stored hash, so changing a
+    password invalidates old entries immediately. Failures are not cached.
+    """
+    key = hmac.new(
+        settings.SECRET_KEY.encode(),
+        b"\0".join((
+            username.encode(),
+            hashlib.sha256(password.encode()).digest(),
+            hashed_password.encode(),
+        )),
+        "sha256",
+    ).digest()
+    with _verify_cache_lock:
+        if key in _verify_cache:
+            return True
+    
+    if not verify_password(password, hashed_password):
+        return False
+    with _verify_cache_lock:
+        _verify_cache[key] = True
+    return True
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
@@ -85,25 +191,38 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     Args:
         db: Database session
         username: Username
-        password: Plain text password (will be truncated to 72 bytes internally)
+        password: Plain text password (legacy bcrypt hashes only check its
+            first 72 bytes)
     """
     user = get_user_by_username(db, username)
     if not user:
         return None
     
-    # Truncate password to 72 bytes before verification (bcrypt limit)
-    # This is handled here so callers don't need to know about bcrypt details
-    password_bytes = password.encode('utf-8')
-    if len(password_bytes) > 72:
-        password = password_bytes[:72].decode('utf-8', errors='ignore')
-    
-    if not verify_password(password, user.hashed_password):
+    if not _verify_password_cached(username, password, user.hashed_password):
         return None
     if not user.is_active:
         return None
+    
+    if needs_rehash(user.hashed_password):
+        _upgrade_password_hash(db, user, password)
     return user
 
 
+def _upgrade_password_hash(db: Session, user: User, password: str) -> None:
+    """
+    Re-hash a verified password with the current argon2 parameters.
+    
+    Moves legacy bcrypt hashes over one login at a time. Failure is logged
+    and otherwise ignored; the old hash keeps working.
+    """
+    try:
+        user.hashed_password = get_password_hash(password)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning("Could not upgrade password hash for user %s", user.id, exc_info=True)
+
+
 async def get_current_user(
     request: Request,
     db: Session = Depends(get_db),
@@ -115,34 +234,27 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Extract token from Authorization header
-    authorization = request.headers.get("Authorization")
+    # Extract token from Authorization header (Starlette keys are lowercase)
+    authorization = request.headers.get("authorization")
     if not authorization:
         raise credentials_exception
     
-    if not authorization.startswith("Bearer "):
+    token = authorization.removeprefix("Bearer ")
+    # Same length means the "Bearer " scheme prefix was missing
+    if len(token) == len(authorization):
         raise credentials_exception
     
-    token = authorization.replace("Bearer ", "").strip()
+    token = token.strip()
     if not token:
         raise credentials_exception
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id_str = payload.get("sub")
-        if user_id_str is None:
-            raise credentials_exception
-        
-        # Convert string back to integer (JWT 'sub' must be string)
-        try:
-            user_id = int(user_id_str)
-        except (ValueError, TypeError):
-            raise credentials_exception
-    except JWTError:
+    user_id = decode_user_id(token)
+    if user_id is None:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None or not user.is_active:
+    # Token decoding is pure CPU; only the user lookup needs a worker thread
+    user = await run_in_threadpool(get_active_user_by_id, db, user_id)
+    if user is None:
         raise credentials_exception
     
     return user
@@ -161,21 +273,8 @@ async def get_current_user_optional(
     if not token:
         return None
     
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id_str = payload.get("sub")
-        if not user_id_str:
-            return None
-        
-        try:
-            user_id = int(user_id_str)
-        except (ValueError, TypeError):
-            return None
-        
-        user = db.query(User).filter(User.id == user_id).first()
-        if user and user.is_active:
-            return user
+    user_id = decode_user_id(token)
+    if user_id is None:
         return None
-    except JWTError:
-        return None
-
+    
+    return await run_in_threadpool(get_active_user_by_id, db, user_id)
@@ -30,3 +30,8 @@ class DatabaseError(ShortURLException):
 
     pass
 
+
+class InvalidCursorError(ShortURLException):
+    """Raised when a pagination cursor is malformed."""
+
+    pass
@@ -0,0 +1,134 @@
+"""Password hashing, optionally offloaded to a process pool.
+
+New hashes use argon2id (argon2-cffi) with OWASP's baseline parameters,
+about a tenth of the CPU time of bcrypt at 12 rounds. bcrypt hashes from
+before the switch still verify and are replaced on the next successful
+login (see needs_rehash).
+
+Hashing is deliberately CPU-bound. Run on the request threadpool it holds
+the GIL for the whole call, so concurrent logins in one worker serialize.
+Handing it to a ProcessPoolExecutor lets hashing scale with cores while
+the waiting thread sits idle.
+
+This module only imports the hashing libraries so spawned pool processes
+start quickly.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import bcrypt
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+logger = logging.getLogger(__name__)
+
+# argon2id: 19 MiB, 2 iterations, 1 lane (OWASP password storage baseline)
+_argon2 = PasswordHasher(time_cost=2, memory_cost=19_456, parallelism=1)
+ARGON2_PREFIX = "$argon2"
+
+# Legacy bcrypt hashes only look at the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with argon2id in the current process (no length limit)."""
+    return _argon2.hash(password)
+
+
+def check_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against an argon2 or legacy bcrypt hash in the current process.
+    
+    bcrypt is called directly rather than through a passlib CryptContext,
+    which adds scheme lookup and hash parsing to every call. Hashes are
+    standard $2b$ strings, so ones created through passlib still verify.
+    """
+    if hashed_password.startswith(ARGON2_PREFIX):
+        try:
+            return _argon2.verify(hashed_password, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+    
+    # Legacy hashes were made from the password cut to 72 bytes and decoded
+    # with errors="ignore" (a split multi-byte character is dropped), so
+    # verify against exactly that input
+    password_bytes = (
+        plain_password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+        .decode("utf-8", errors="ignore")
+        .encode("utf-8")
+    )
+    try:
+        return bcrypt.checkpw(password_bytes, hashed_password.encode("ascii"))
+    except ValueError:
+        # Malformed or unknown hash
+        return False
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Whether a stored hash is bcrypt or argon2 with outdated parameters."""
+    if not hashed_password.startswith(ARGON2_PREFIX):
+        return True
+    try:
+        return _argon2.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return True
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Return the shared hashing pool, creating it on first use."""
+    global _pool
+    
+    # Imported lazily so pool processes never load application settings
+    from app.config import settings
+    
+    # Per web worker: gunicorn -w N starts N pools, so keep this small
+    workers = settings.PASSWORD_HASH_WORKERS
+    if workers <= 0:
+        return None
+    
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that already runs threads is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info("Started password hashing pool with %d workers", workers)
+    return _pool
+
+
+def run_hash(func, *args):
+    """
+    Run a hashing function in the process pool, or inline if disabled.
+    
+    Blocks the calling thread until the result is ready, so callers keep
+    running on the request threadpool as before.
+    
+    Args:
+        func: hash_password or check_password
+        *args: Arguments for func
+    
+    Returns:
+        The function's result
+    """
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    return pool.submit(func, *args).result()
+
+
+def shutdown_pool() -> None:
+    """Stop the hashing pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,67 @@
+"""HTTP caching helpers for conditional GET support."""
+
+import hashlib
+from typing import Optional
+
+import orjson
+from fastapi import Request, Response, status
+
+
+def compute_etag(body: bytes) -> str:
+    """Return a strong ETag for a response body."""
+    return f'"{hashlib.md5(body, usedforsecurity=False).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+    
+    Handles lists of tags, weak validators (``W/``) and ``*``, using the weak
+    comparison RFC 9110 prescribes for If-None-Match.
+    """
+    if not if_none_match:
+        return False
+    
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    media_type: str,
+    cache_control: str,
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """
+    Build a response carrying an ETag, or 304 if the client's copy is current.
+    
+    Args:
+        request: Incoming request (for If-None-Match)
+        body: Fully rendered response body
+        media_type: Content type of the body
+        cache_control: Cache-Control header value
+        headers: Extra headers for the full (200) response
+    
+    Returns:
+        Response: 304 Not Modified with no body, or 200 with the body
+    """
+    etag = compute_etag(body)
+    cache_headers = {"ETag": etag, "Cache-Control": cache_control}
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={**(headers or {}), **cache_headers},
+    )
+
+
+def cached_json_response(request: Request, content: dict, cache_control: str) -> Response:
+    """Serialize content with orjson and return it via cached_response."""
+    return cached_response(request, orjson.dumps(content), "application/json", cache_control)
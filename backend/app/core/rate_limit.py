@@ -0,0 +1,51 @@
+"""In-process token-bucket rate limiting."""
+
+import threading
+import time
+
+from cachetools import TTLCache
+
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets held in memory.
+    
+    Each key may burst up to ``capacity`` requests, refilled continuously at
+    ``capacity / window`` tokens per second. Buckets idle for a full window
+    are evicted (they would be full again anyway), which bounds memory to
+    the keys seen recently. State is per worker process.
+    """
+
+    def __init__(self, capacity: int, window: float, max_keys: int = 100_000):
+        """
+        Initialize the limiter.
+        
+        Args:
+            capacity: Requests allowed per window (and the burst size)
+            window: Window length in seconds
+            max_keys: Most buckets kept at once
+        """
+        self.capacity = capacity
+        self.refill_rate = capacity / window
+        self._buckets: TTLCache = TTLCache(maxsize=max_keys, ttl=window)
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token for a key.
+        
+        Args:
+            key: Bucket key, e.g. a client IP
+        
+        Returns:
+            0.0 if the request is allowed, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.refill_rate
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
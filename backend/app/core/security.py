@@ -1,14 +1,47 @@
 """Security utilities for URL validation and short code generation."""
 
+import re
 import secrets
 import string
-from urllib.parse import urlparse
 
 import validators
 
 from app.config import settings
 from app.core.exceptions import InvalidURLError
 
+# Custom codes are 4-20 alphanumeric characters and generated ones are
+# SHORT_CODE_LENGTH long; "-" and "_" are tolerated as URL-safe extras
+_SHORT_CODE_MIN = min(4, settings.SHORT_CODE_LENGTH)
+_SHORT_CODE_MAX = max(20, settings.SHORT_CODE_LENGTH)
+_short_code_match = re.compile(
+    rf"[A-Za-z0-9_-]{{{_SHORT_CODE_MIN},{_SHORT_CODE_MAX}}}\Z"
+).match
+
+# Fast path for the common shape of submitted links: http(s), a plain domain
+# name and an optional path, with no port, query or fragment. Everything it
+# accepts also passes validators.url (a strict subset), so anything else
+# falls through to the full check instead of being rejected.
+_simple_url_match = re.compile(
+    r"https?://(?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63}"
+    r"(?:/[a-z0-9/\-._~!$&'()*+,;=:@%]*)?\Z",
+    re.IGNORECASE | re.ASCII,
+).match
+
+
+# Same rule urllib.parse.urlsplit uses to find a scheme: an ASCII letter,
+# then letters, digits, "+", "-" or "." up to the first ":"
+_has_scheme = re.compile(r"[A-Za-z][A-Za-z0-9+.\-]*:").match
+
+
+_ALPHABET = (string.ascii_letters + string.digits).encode("ascii")
+_ALPHABET_SIZE = len(_ALPHABET)
+# Largest multiple of the alphabet size that fits in a byte (248)
+_BYTE_LIMIT = 256 - 256 % _ALPHABET_SIZE
+# bytes.translate tables: map each random byte to a code character and drop
+# the bytes >= _BYTE_LIMIT that would bias "% 62"
+_BYTE_TO_CHAR = bytes(_ALPHABET[b % _ALPHABET_SIZE] for b in range(256))
+_REJECTED_BYTES = bytes(range(_BYTE_LIMIT, 256))
+
 
 def generate_short_code(length: int = None) -> str:
     """
@@ -23,8 +56,31 @@ def generate_short_code(length: int = None) -> str:
     if length is None:
         length = settings.SHORT_CODE_LENGTH
     
-    alphabet = string.ascii_letters + string.digits
-    return "".join(secrets.choice(alphabet) for _ in range(length))
+    # One os.urandom call per code, mapped to characters by a single C-level
+    # translate. ~3% of bytes are rejected, so a 25% surplus almost always
+    # suffices in one draw.
+    code = b""
+    while len(code) < length:
+        code += secrets.token_bytes(length + length // 4 + 2).translate(
+            _BYTE_TO_CHAR, _REJECTED_BYTES
+        )
+    return code[:length].decode("ascii")
+
+
+def is_valid_short_code(short_code: str) -> bool:
+    """
+    Check whether a string could be a short code.
+    
+    Cheap enough to run before any database lookup, so malformed codes from
+    scanners can be rejected without a query.
+    
+    Args:
+        short_code: Candidate short code
+    
+    Returns:
+        bool: True if the format is valid
+    """
+    return _short_code_match(short_code) is not None
 
 
 def validate_url(url: str) -> str:
@@ -45,18 +101,20 @@ def validate_url(url: str) -> str:
     
     url = url.strip()
     
+    # Check URL length before doing any parsing work on huge inputs
+    if len(url) > settings.MAX_URL_LENGTH:
+        raise InvalidURLError(f"URL exceeds maximum length of {settings.MAX_URL_LENGTH}")
+    
     # Add protocol if missing
-    parsed = urlparse(url)
-    if not parsed.scheme:
+    if _has_scheme(url) is None:
         url = f"https://{url}"
+        # The prefix may push a borderline URL over the limit
+        if len(url) > settings.MAX_URL_LENGTH:
+            raise InvalidURLError(f"URL exceeds maximum length of {settings.MAX_URL_LENGTH}")
     
     # Validate URL
-    if not validators.url(url):
+    if _simple_url_match(url) is None and not validators.url(url):
         raise InvalidURLError(f"Invalid URL format: {url}")
     
-    # Check URL length
-    if len(url) > settings.MAX_URL_LENGTH:
-        raise InvalidURLError(f"URL exceeds maximum length of {settings.MAX_URL_LENGTH}")
-    
     return url
 
@@ -1,9 +1,13 @@
 """Database configuration and session management."""
 
 import logging
-from sqlalchemy import create_engine, text
+from typing import AsyncIterator
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 
 from app.config import settings
 
@@ -16,28 +20,64 @@ if settings.DATABASE_URL.startswith("sqlite"):
         settings.DATABASE_URL,
         connect_args={"check_same_thread": False},
         echo=settings.DATABASE_ECHO,
+        query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+        # WAL lets redirects read while clicks are written and fsyncs only
+        # at checkpoints with synchronous=NORMAL (still safe against app
+        # crashes). journal_mode persists in the file; synchronous is per
+        # connection, so both are set on every new connection.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+elif settings.DATABASE_POOL_DISABLED:
+    # An external pooler (e.g. PgBouncer) owns connection reuse
+    engine = create_engine(
+        settings.DATABASE_URL,
+        echo=settings.DATABASE_ECHO,
+        query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+        poolclass=NullPool,
     )
 else:
     # PostgreSQL or other databases
     engine = create_engine(
         settings.DATABASE_URL,
         echo=settings.DATABASE_ECHO,
-        pool_pre_ping=True,  # Verify connections before using
-        pool_size=10,
-        max_overflow=20,
+        query_cache_size=settings.DATABASE_QUERY_CACHE_SIZE,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        # Recycling replaces connections before idle timeouts bite, so the
+        # per-checkout ping is off by default
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+        # Roll back on checkin so no transaction state leaks between requests
+        pool_reset_on_return="rollback",
     )
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create session factory. Sessions live for one request and repositories
+# commit per operation, so keep loaded attributes after commit rather than
+# re-SELECTing a row the caller just wrote or read.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
 
 
-def get_db() -> Session:
+async def get_db() -> AsyncIterator[Session]:
     """
     Dependency function to get database session.
     
+    Declared async so FastAPI resolves it on the event loop instead of the
+    threadpool. Creating a session does no I/O (a connection is only checked
+    out on first query). Closing one only does I/O while a transaction still
+    holds a connection (it is rolled back and returned to the pool), so only
+    then is it offloaded to a worker thread; requests that never queried, or
+    whose repositories already committed, close on the loop.
+    
     Yields:
         Session: SQLAlchemy database session
     """
@@ -45,7 +85,10 @@ def get_db() -> Session:
     try:
         yield db
     finally:
-        db.close()
+        if db.in_transaction():
+            await run_in_threadpool(db.close)
+        else:
+            db.close()
 
 
 def init_db() -> None:
@@ -54,6 +97,7 @@ def init_db() -> None:
     from app.models import User, URL, Analytics  # noqa: F401
     
     Base.metadata.create_all(bind=engine)
+    logger.info("Database pool: %s", engine.pool.status())
     
     # For SQLite, handle migration of existing tables
     if engine.url.drivername == "sqlite":
@@ -1,22 +1,33 @@
 """FastAPI application entry point."""
 
 import logging
+import sys
+
+import anyio
+import orjson
 
 from fastapi import FastAPI, Request, HTTPException, status, Depends
-from fastapi.responses import RedirectResponse, PlainTextResponse, Response
+from fastapi.responses import ORJSONResponse, RedirectResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.utils import is_body_allowed_for_status_code
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.config import settings
-from app.database import init_db, get_db
+from app.database import init_db
+from app.api.dependencies import get_analytics_service, rate_limit_by_ip, redirect_short_code
 from app.api.routes import api_router
-from app.services.analytics_service import AnalyticsService
+from app.services.analytics_service import AnalyticsService, click_buffer
+from app.services.url_service import expiry_sweeper, start_qr_prewarm
 from app.core.exceptions import URLNotFoundError
+from app.core.hashing import shutdown_pool
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO if not settings.DEBUG else logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout,
 )
 logger = logging.getLogger(__name__)
 
@@ -25,6 +36,7 @@ app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="A URL shortening service with analytics",
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if settings.DEBUG else None,  # Disable docs in production
     redoc_url="/redoc" if settings.DEBUG else None,  # Disable redoc in production
 )
@@ -67,38 +79,61 @@ app.add_middleware(
 )
 
 
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """
+    Serialize HTTP errors with orjson, like every other response.
+    
+    FastAPI's built-in handler always uses the stdlib JSONResponse, and 404s
+    from scanners probing random paths are among the most frequent responses.
+    """
+    headers = getattr(exc, "headers", None)
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
+class _TextGZipMiddleware(GZipMiddleware):
+    """GZip responses, except QR PNGs which are already deflate-compressed."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].endswith("/qr"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress JSON and text bodies over 500 bytes; smaller ones don't gain enough
+app.add_middleware(_TextGZipMiddleware, minimum_size=500, compresslevel=6)
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database on startup."""
+    """Check configuration and initialize database on startup."""
+    settings.warn_if_insecure()
+    # Bounds concurrent blocking work; must be set from inside the event loop
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
     init_db()
+    click_buffer.start()
+    expiry_sweeper.start()
+    start_qr_prewarm()
 
 
-@app.get("/")
-async def root():
-    """Root endpoint."""
-    return {
-        "message": "ShortURL API",
-        "version": settings.APP_VERSION,
-    }
+@app.on_event("shutdown")
+def shutdown_event():
+    """Flush pending clicks, stop the expiry sweeper and release worker processes."""
+    click_buffer.stop()
+    expiry_sweeper.stop()
+    shutdown_pool()
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
-
-
-@app.get("/robots.txt", response_class=PlainTextResponse)
-async def robots_txt():
-    """
-    Serve robots.txt to control web crawler behavior.
-    Prevents crawling of API endpoints and rate limits crawlers.
-    """
+def _build_robots_txt() -> str:
+    """Render robots.txt for the configured BASE_URL."""
     # Use BASE_URL from settings for sitemap (if configured)
     base_url = settings.BASE_URL
     sitemap_line = f"Sitemap: {base_url}/sitemap.xml" if base_url and not base_url.startswith("http://localhost") else "# Sitemap: https://yourdomain.com/sitemap.xml"
     
-    robots_content = f"""# robots.txt for ShortURL
+    return f"""# robots.txt for ShortURL
 # This file controls how web crawlers and bots interact with the site
 
 User-agent: *
@@ -116,42 +151,60 @@ Crawl-delay: 10
 # Sitemap location
 {sitemap_line}
 """
-    return robots_content
+
+
+# Static bodies depend only on settings, so they are built once at import
+_ROOT_BODY = orjson.dumps({"message": "ShortURL API", "version": settings.APP_VERSION})
+_HEALTH_BODY = orjson.dumps({"status": "healthy"})
+_ROBOTS_BODY = _build_robots_txt().encode("utf-8")
+
+
+@app.get("/")
+async def root():
+    """Root endpoint."""
+    return Response(content=_ROOT_BODY, media_type="application/json")
+
+
+@app.get("/health")
+async def health_check():
+    """Health check endpoint."""
+    return Response(content=_HEALTH_BODY, media_type="application/json")
+
+
+@app.get("/robots.txt", response_class=PlainTextResponse)
+async def robots_txt():
+    """
+    Serve robots.txt to control web crawler behavior.
+    Prevents crawling of API endpoints and rate limits crawlers.
+    """
+    return PlainTextResponse(
+        content=_ROBOTS_BODY,
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
 
 
 # Include API routes BEFORE catch-all route to ensure proper route matching
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
 
-# Reserved paths that should not be treated as short codes
-RESERVED_PATHS = {
-    "api", "health", "robots.txt",
-    "favicon.ico", "static", "assets"
-}
+@app.get("/favicon.ico", include_in_schema=False)
+async def favicon():
+    """No favicon; answer browsers cheaply instead of via the redirect route."""
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
-@app.get("/{short_code}")
+# Rate limiting runs first, so throttled clients never reach the database
+@app.get("/{short_code}", dependencies=[Depends(rate_limit_by_ip)])
 async def redirect_to_url(
-    short_code: str,
     request: Request,
-    db: Session = Depends(get_db),
+    short_code: str = Depends(redirect_short_code),
+    analytics_service: AnalyticsService = Depends(get_analytics_service),
 ):
     """
     Redirect to the original URL and track analytics.
     
     - **short_code**: The short code to redirect
     """
-    short_code_lower = short_code.lower()
-    
-    # Check if this is a reserved path
-    if short_code_lower in RESERVED_PATHS:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Path '/{short_code}' is reserved and cannot be used as a short code",
-        )
-    
-    analytics_service = AnalyticsService(db)
-    
     try:
         # Get IP address
         ip_address = request.client.host if request.client else None
@@ -160,8 +213,22 @@ async def redirect_to_url(
         user_agent = request.headers.get("user-agent")
         referer = request.headers.get("referer")
         
-        # Track click and get original URL
-        original_url = analytics_service.url_repository.get_by_short_code(short_code)
+        # Hot codes resolve from the cache right here; anything that needs
+        # the database is looked up (and tracked) off the event loop
+        original_url = analytics_service.resolve_cached_redirect(
+            short_code,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            referer=referer,
+        )
+        if original_url is None:
+            original_url = await run_in_threadpool(
+                analytics_service.resolve_redirect,
+                short_code,
+                ip_address=ip_address,
+                user_agent=user_agent,
+                referer=referer,
+            )
         
         if not original_url:
             raise HTTPException(
@@ -169,15 +236,7 @@ async def redirect_to_url(
                 detail=f"Short code '{short_code}' not found or expired",
             )
         
-        # Track analytics
-        analytics_service.track_click(
-            short_code=short_code,
-            ip_address=ip_address,
-            user_agent=user_agent,
-            referer=referer,
-        )
-        
-        return RedirectResponse(url=original_url.original_url, status_code=status.HTTP_302_FOUND)
+        return RedirectResponse(url=original_url, status_code=status.HTTP_302_FOUND)
     
     except URLNotFoundError:
         raise HTTPException(
@@ -1,10 +1,10 @@
 """Analytics model for tracking URL clicks."""
 
-from datetime import datetime
 from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import IPAddress, utcnow
 
 
 class Analytics(Base):
@@ -14,8 +14,8 @@ class Analytics(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     url_id = Column(Integer, ForeignKey("urls.id", ondelete="CASCADE"), nullable=False, index=True)
-    clicked_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    ip_address = Column(String(45), nullable=True)  # IPv6 max length
+    clicked_at = Column(DateTime, default=utcnow(), server_default=utcnow(), nullable=False, index=True)
+    ip_address = Column(IPAddress, nullable=True)
     user_agent = Column(String(512), nullable=True)
     referer = Column(String(512), nullable=True)
 
@@ -26,6 +26,9 @@ class Analytics(Base):
         Index("idx_url_clicked_at", "url_id", "clicked_at"),
     )
 
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self) -> str:
         return f"<Analytics(url_id={self.url_id}, clicked_at='{self.clicked_at}')>"
 
@@ -0,0 +1,122 @@
+"""Shared column types and SQL expressions for the models."""
+
+import ipaddress
+from typing import Optional
+
+from sqlalchemy.dialects.postgresql import INET
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime, String, TypeDecorator
+
+
+class utcnow(FunctionElement):
+    """
+    Current UTC time evaluated by the database, as a naive timestamp.
+
+    Columns store naive UTC datetimes (the application compares them with
+    datetime.utcnow()), so the server clock must be read in UTC regardless
+    of the database session's time zone.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utcnow)
+def _compile_utcnow_default(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utcnow, "postgresql")
+def _compile_utcnow_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+class utc_days_from_now(FunctionElement):
+    """
+    The database's current UTC time plus a number of days, as a naive timestamp.
+
+    Lets inserts compute expiry server-side from a bound day count, on the
+    same clock as utcnow().
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_days_from_now)
+def _compile_utc_days_from_now_default(element, compiler, **kw):
+    return "datetime('now', '+' || %s || ' days')" % compiler.process(element.clauses, **kw)
+
+
+@compiles(utc_days_from_now, "postgresql")
+def _compile_utc_days_from_now_postgresql(element, compiler, **kw):
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP) + make_interval(days => %s)" % compiler.process(
+        element.clauses, **kw
+    )
+
+
+class day_label(FunctionElement):
+    """A timestamp formatted as "YYYY-MM-DD" by the database."""
+
+    type = String()
+    inherit_cache = True
+
+
+@compiles(day_label)
+def _compile_day_label_default(element, compiler, **kw):
+    return "strftime('%%Y-%%m-%%d', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(day_label, "postgresql")
+def _compile_day_label_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'YYYY-MM-DD')" % compiler.process(element.clauses, **kw)
+
+
+class hour_label(FunctionElement):
+    """A timestamp's hour of day formatted as "HH:00" by the database."""
+
+    type = String()
+    inherit_cache = True
+
+
+@compiles(hour_label)
+def _compile_hour_label_default(element, compiler, **kw):
+    return "strftime('%%H:00', %s)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(hour_label, "postgresql")
+def _compile_hour_label_postgresql(element, compiler, **kw):
+    return "to_char(%s, 'HH24:\"00\"')" % compiler.process(element.clauses, **kw)
+
+
+class IPAddress(TypeDecorator):
+    """
+    IP address column: native INET on PostgreSQL, text elsewhere.
+
+    INET stores 7 or 19 bytes instead of up to 45 characters and compares
+    without text parsing, which keeps COUNT(DISTINCT ip_address) cheap.
+    Values are read back as plain strings on every backend.
+    """
+
+    impl = String(45)  # IPv6 max length
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(INET())
+        return dialect.type_descriptor(String(45))
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None or dialect.name != "postgresql":
+            return value
+        # INET rejects anything that is not an address; store NULL rather
+        # than failing the whole insert (and a batch of clicks with it)
+        try:
+            return str(ipaddress.ip_address(value))
+        except ValueError:
+            return None
+
+    def process_result_value(self, value, dialect) -> Optional[str]:
+        return None if value is None else str(value)
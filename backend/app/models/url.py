@@ -1,10 +1,10 @@
 """URL model for database."""
 
-from datetime import datetime
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import utcnow
 
 
 class URL(Base):
@@ -16,7 +16,7 @@ class URL(Base):
     short_code = Column(String(50), unique=True, index=True, nullable=False)
     original_url = Column(String(2048), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=utcnow(), server_default=utcnow(), nullable=False)
     expires_at = Column(DateTime, nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
     click_count = Column(Integer, default=0, nullable=False)
@@ -26,10 +26,21 @@ class URL(Base):
     analytics = relationship("Analytics", back_populates="url", cascade="all, delete-orphan")
 
     __table_args__ = (
-        Index("idx_short_code_active", "short_code", "is_active"),
         Index("idx_user_id_created", "user_id", "created_at"),
+        # Covers every column, so short-code lookups (redirects and URL
+        # info) filtered on is_active and expires_at are index-only scans
+        Index(
+            "idx_urls_code_active_exp",
+            "short_code",
+            "is_active",
+            "expires_at",
+            postgresql_include=["original_url", "user_id", "click_count", "created_at", "id"],
+        ).ddl_if(dialect="postgresql"),
     )
 
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self) -> str:
         return f"<URL(short_code='{self.short_code}', original_url='{self.original_url[:50]}...')>"
 
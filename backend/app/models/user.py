@@ -1,10 +1,10 @@
 """User model for authentication."""
 
-from datetime import datetime
 from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import utcnow
 
 
 class User(Base):
@@ -17,7 +17,7 @@ class User(Base):
     username = Column(String(100), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=utcnow(), server_default=utcnow(), nullable=False)
 
     # Relationship to URLs
     urls = relationship("URL", back_populates="owner", cascade="all, delete-orphan")
@@ -26,6 +26,9 @@ class User(Base):
         Index("idx_email_active", "email", "is_active"),
     )
 
+    # Fetch server-generated timestamps with RETURNING on insert
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self) -> str:
         return f"<User(id={self.id}, email='{self.email}', username='{self.username}')>"
 
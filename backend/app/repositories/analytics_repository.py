@@ -3,9 +3,11 @@
 from datetime import datetime, date
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import String, case, cast, distinct, func, insert, literal, null, select, tuple_, union_all, update
 
 from app.models.analytics import Analytics
+from app.models.types import day_label, hour_label
+from app.models.url import URL
 from app.core.exceptions import DatabaseError
 
 
@@ -51,13 +53,46 @@ class AnalyticsRepository:
                 referer=referer,
             )
             self.db.add(analytics)
+            # No refresh: id and clicked_at come back with the INSERT
+            # (eager_defaults), and expire_on_commit=False keeps the column
+            # attributes loaded after the commit
             self.db.commit()
-            self.db.refresh(analytics)
             return analytics
         except Exception as e:
             self.db.rollback()
             raise DatabaseError(f"Failed to create analytics record: {str(e)}") from e
 
+    def record_clicks(self, rows: list[dict], click_counts: dict[int, int]) -> None:
+        """
+        Insert a batch of click rows and bump click counters in one transaction.
+        
+        Two statements regardless of batch size: a bulk INSERT and a single
+        UPDATE that adds each URL's count via CASE.
+        
+        Args:
+            rows: Analytics column values (url_id, clicked_at, ip_address,
+                user_agent, referer), one dict per click
+            click_counts: Number of clicks to add per URL ID
+        
+        Raises:
+            DatabaseError: If the batch fails
+        """
+        try:
+            # executemany; batched into multi-row INSERTs by insertmanyvalues
+            self.db.execute(insert(Analytics), rows)
+            # One UPDATE for every URL in the batch:
+            # click_count = click_count + CASE id WHEN :id THEN :n ... END
+            self.db.execute(
+                update(URL)
+                .where(URL.id.in_(click_counts))
+                .values(click_count=URL.click_count + case(click_counts, value=URL.id, else_=0))
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise DatabaseError(f"Failed to record clicks: {str(e)}") from e
+
     def get_by_url_id(self, url_id: int, limit: Optional[int] = None) -> list[Analytics]:
         """
         Get analytics records for a URL.
@@ -78,6 +113,36 @@ class AnalyticsRepository:
         
         return query.all()
 
+    def get_recent_clicks(self, url_id: int, limit: int) -> list[dict]:
+        """
+        Get the newest click records for a URL as plain dicts.
+        
+        Selects the columns with Core rather than loading Analytics objects,
+        so rows skip ORM identity-map and instrumentation work.
+        
+        Args:
+            url_id: The URL ID
+            limit: Maximum number of records to return
+        
+        Returns:
+            List of dicts with the AnalyticsResponse fields, newest first
+        """
+        stmt = (
+            select(
+                Analytics.id,
+                Analytics.url_id,
+                Analytics.clicked_at,
+                Analytics.ip_address,
+                Analytics.user_agent,
+                Analytics.referer,
+            )
+            .where(Analytics.url_id == url_id)
+            .order_by(Analytics.clicked_at.desc())
+            .limit(limit)
+        )
+        # RowMapping isn't a dict subclass, which orjson requires
+        return [dict(row) for row in self.db.execute(stmt).mappings()]
+
     def get_click_count_by_date(self, url_id: int) -> dict[str, int]:
         """
         Get click count grouped by date for a URL.
@@ -88,18 +153,17 @@ class AnalyticsRepository:
         Returns:
             Dictionary mapping date strings to click counts
         """
+        # Dates are formatted by the database, so rows map straight to a dict
+        day = day_label(Analytics.clicked_at)
         results = (
-            self.db.query(
-                func.date(Analytics.clicked_at).label("date"),
-                func.count(Analytics.id).label("count"),
-            )
+            self.db.query(day, func.count(Analytics.id))
             .filter(Analytics.url_id == url_id)
-            .group_by(func.date(Analytics.clicked_at))
-            .order_by(func.date(Analytics.clicked_at).desc())
+            .group_by(day)
+            .order_by(day.desc())
             .all()
         )
         
-        return {str(result.date): result.count for result in results}
+        return dict(results)
 
     def get_unique_ip_count(self, url_id: int) -> int:
         """
@@ -156,16 +220,144 @@ class AnalyticsRepository:
         Returns:
             Dictionary mapping hour strings to click counts
         """
+        hour = hour_label(Analytics.clicked_at)
         results = (
-            self.db.query(
-                func.extract("hour", Analytics.clicked_at).label("hour"),
-                func.count(Analytics.id).label("count"),
-            )
+            self.db.query(hour, func.count(Analytics.id))
             .filter(Analytics.url_id == url_id)
-            .group_by(func.extract("hour", Analytics.clicked_at))
-            .order_by(func.extract("hour", Analytics.clicked_at))
+            .group_by(hour)
+            .order_by(hour)
             .all()
         )
         
-        return {f"{int(result.hour):02d}:00": result.count for result in results}
+        return dict(results)
 
+    def get_analytics_bundle(self, url_id: int, referer_limit: int = 10) -> dict:
+        """
+        Get all summary aggregates for a URL in a single round trip.
+        
+        Clicks by date, clicks by hour, top referers and the unique IP count
+        come from one Core statement. PostgreSQL computes them in one pass
+        over the URL's clicks with GROUPING SETS; SQLite, which lacks them,
+        runs a UNION ALL of the four aggregates.
+        
+        Args:
+            url_id: The URL ID
+            referer_limit: Number of top referers to return
+        
+        Returns:
+            Dictionary with clicks_by_date, clicks_by_hour, top_referers and
+            unique_ips, shaped like the individual getters' results
+        """
+        if self.db.get_bind().dialect.name == "postgresql":
+            rows = self._bundle_rows_grouping_sets(url_id)
+        else:
+            rows = self._bundle_rows_union(url_id, referer_limit)
+        
+        dates: list[tuple[str, int]] = []
+        hours: list[tuple[str, int]] = []
+        referers: list[dict] = []
+        unique_ip_count = 0
+        for kind, key, count in rows:
+            if kind == "date":
+                dates.append((key, count))
+            elif kind == "hour":
+                hours.append((key, count))
+            elif kind == "referer":
+                if key is not None:
+                    referers.append({"referer": key, "count": count})
+            else:
+                unique_ip_count = count or 0
+        
+        dates.sort(reverse=True)
+        hours.sort()
+        referers.sort(key=lambda item: item["count"], reverse=True)
+        
+        return {
+            "clicks_by_date": dict(dates),
+            "clicks_by_hour": dict(hours),
+            "top_referers": referers[:referer_limit],
+            "unique_ips": unique_ip_count,
+        }
+
+    def _bundle_rows_grouping_sets(self, url_id: int) -> list[tuple[str, Optional[str], int]]:
+        """
+        Aggregate a URL's clicks by date, hour and referer in one scan (PostgreSQL).
+        
+        GROUPING() tells the sets apart: its bits are set for the columns a
+        row is *not* grouped by (day = 4, hour = 2, referer = 1). The empty
+        set is the grand total, which carries the distinct IP count.
+        
+        Returns:
+            (kind, key, count) rows, as consumed by get_analytics_bundle
+        """
+        day = day_label(Analytics.clicked_at)
+        hour = hour_label(Analytics.clicked_at)
+        stmt = (
+            select(
+                func.grouping(day, hour, Analytics.referer).label("grouping"),
+                day.label("day"),
+                hour.label("hour"),
+                Analytics.referer,
+                func.count(Analytics.id).label("count"),
+                func.count(distinct(Analytics.ip_address)).label("unique_ips"),
+            )
+            .where(Analytics.url_id == url_id)
+            .group_by(func.grouping_sets(tuple_(day), tuple_(hour), tuple_(Analytics.referer), tuple_()))
+        )
+        
+        rows = []
+        for row in self.db.execute(stmt):
+            if row.grouping == 0b011:
+                rows.append(("date", row.day, row.count))
+            elif row.grouping == 0b101:
+                rows.append(("hour", row.hour, row.count))
+            elif row.grouping == 0b110:
+                rows.append(("referer", row.referer, row.count))
+            else:
+                rows.append(("unique_ips", None, row.unique_ips))
+        return rows
+
+    def _bundle_rows_union(self, url_id: int, referer_limit: int) -> list[tuple[str, Optional[str], int]]:
+        """
+        Aggregate a URL's clicks as a UNION ALL of one query per aggregate.
+        
+        Rows carry a ``kind`` column telling the groups apart.
+        
+        Returns:
+            (kind, key, count) rows, as consumed by get_analytics_bundle
+        """
+        day = day_label(Analytics.clicked_at)
+        hour = hour_label(Analytics.clicked_at)
+        click_count = func.count(Analytics.id)
+        
+        by_date = (
+            select(literal("date").label("kind"), day.label("key"), click_count.label("count"))
+            .where(Analytics.url_id == url_id)
+            .group_by(day)
+        )
+        by_hour = (
+            select(literal("hour"), hour, click_count)
+            .where(Analytics.url_id == url_id)
+            .group_by(hour)
+        )
+        # LIMIT is not allowed directly inside a compound SELECT on SQLite,
+        # so top referers are ranked in a subquery first
+        top_referers = (
+            select(Analytics.referer.label("referer"), click_count.label("count"))
+            .where(
+                Analytics.url_id == url_id,
+                Analytics.referer.isnot(None),
+            )
+            .group_by(Analytics.referer)
+            .order_by(click_count.desc())
+            .limit(referer_limit)
+            .subquery()
+        )
+        by_referer = select(literal("referer"), top_referers.c.referer, top_referers.c.count)
+        unique_ips = select(
+            literal("unique_ips"),
+            cast(null(), String),
+            func.count(distinct(Analytics.ip_address)),
+        ).where(Analytics.url_id == url_id)
+        
+        return self.db.execute(union_all(by_date, by_hour, by_referer, unique_ips)).all()
@@ -1,13 +1,130 @@
 """Repository for URL data access operations."""
 
-from datetime import datetime
-from typing import Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from cachetools import TTLCache
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import Select, bindparam, delete, exists, or_, func, lambda_stmt, literal, select, tuple_, update
 
+from app.config import settings
+from app.models.types import utc_days_from_now, utcnow
+from app.models.analytics import Analytics
 from app.models.url import URL
 from app.core.exceptions import URLNotFoundError, DatabaseError
 
+# Redirect targets of active URLs: short_code -> (id, original_url, expires_at
+# epoch or None). Plain tuples rather than ORM objects, so entries never touch
+# a session. Each worker process keeps its own copy; deactivation clears only
+# the worker that handled it, so REDIRECT_CACHE_TTL bounds how long others
+# keep redirecting.
+_redirect_cache: TTLCache = TTLCache(
+    maxsize=settings.REDIRECT_CACHE_SIZE, ttl=settings.REDIRECT_CACHE_TTL
+)
+# Short codes with no active URL, so repeated misses (typos, scanners) skip
+# the SELECT too. Kept brief because other workers can't clear it when the
+# code is created.
+_redirect_miss_cache: TTLCache = TTLCache(
+    maxsize=settings.REDIRECT_CACHE_SIZE, ttl=settings.REDIRECT_MISS_CACHE_TTL
+)
+_redirect_cache_lock = threading.Lock()
+
+# Row counts for list_urls: (user_id, include_inactive) -> total. Only read
+# when paging with a cursor, where the windowed count no longer covers the
+# whole list. Dropped for the owner whenever one of their URLs changes.
+_list_count_cache: TTLCache = TTLCache(
+    maxsize=settings.URL_CACHE_SIZE, ttl=settings.URL_LIST_COUNT_CACHE_TTL
+)
+_list_count_cache_lock = threading.Lock()
+
+# Statements with no optional parts are built once; executions only supply
+# the bound values and hit the compiled cache directly
+_SHORT_CODE_EXISTS = select(exists().where(URL.short_code == bindparam("code")))
+_GET_BY_ID = select(URL).where(URL.id == bindparam("url_id"))
+
+# Prefix of every short_url; BASE_URL with exactly one trailing slash
+SHORT_URL_PREFIX = settings.BASE_URL.rstrip("/") + "/"
+
+# URLResponse fields stored as columns (short_url is derived)
+_LIST_COLUMNS = (
+    URL.id,
+    URL.short_code,
+    URL.original_url,
+    URL.created_at,
+    URL.expires_at,
+    URL.is_active,
+    URL.click_count,
+)
+
+
+def invalidate_redirect_cache(short_code: str) -> None:
+    """Drop any cached redirect target (or remembered miss) for a short code."""
+    with _redirect_cache_lock:
+        _redirect_cache.pop(short_code, None)
+        _redirect_miss_cache.pop(short_code, None)
+
+
+def is_redirect_miss_cached(short_code: str) -> bool:
+    """Whether a short code was recently looked up and had no active URL."""
+    with _redirect_cache_lock:
+        return short_code in _redirect_miss_cache
+
+
+def peek_redirect_target(short_code: str) -> Optional[tuple[int, str]]:
+    """
+    Get a cached redirect target without touching the database.
+    
+    Args:
+        short_code: The short code to look up
+    
+    Returns:
+        Tuple of (URL ID, original URL) if cached and unexpired, None otherwise
+    """
+    with _redirect_cache_lock:
+        cached = _redirect_cache.get(short_code)
+    if cached is None:
+        return None
+    url_id, original_url, expires_at_epoch = cached
+    if expires_at_epoch is not None and expires_at_epoch < time.time():
+        return None
+    return url_id, original_url
+
+
+def _invalidate_list_count(user_id: Optional[int]) -> None:
+    """Drop cached list counts for a URL owner."""
+    with _list_count_cache_lock:
+        _list_count_cache.pop((user_id, False), None)
+        _list_count_cache.pop((user_id, True), None)
+
+
+def _user_urls_select(user_id: Optional[int], include_inactive: bool = False) -> Select:
+    """
+    Select URLs shaped like URLResponse, newest first.
+    
+    Shared by list_urls and iter_urls so pages and exports return the same
+    columns, filters and order.
+    
+    Args:
+        user_id: Optional owner to filter by
+        include_inactive: Whether to include inactive URLs
+    
+    Returns:
+        Select of the URLResponse columns, short_url included
+    """
+    stmt = select(
+        *_LIST_COLUMNS,
+        (literal(SHORT_URL_PREFIX) + URL.short_code).label("short_url"),
+    )
+    if user_id is not None:
+        stmt = stmt.where(URL.user_id == user_id)
+    if not include_inactive:
+        stmt = stmt.where(URL.is_active == True)
+    # id breaks ties between URLs created in the same instant
+    return stmt.order_by(URL.created_at.desc(), URL.id.desc())
+
 
 class URLRepository:
     """Repository class for URL database operations."""
@@ -21,31 +138,44 @@ class URLRepository:
         """
         self.db = db
 
-    def create(self, short_code: str, original_url: str, expires_at: Optional[datetime] = None, user_id: Optional[int] = None) -> URL:
+    def create(self, short_code: str, original_url: str, expires_in_days: Optional[int] = None, user_id: Optional[int] = None) -> Optional[URL]:
         """
-        Create a new URL record.
+        Create a new URL record unless the short code is taken.
+        
+        Issues a single INSERT ... ON CONFLICT (short_code) DO NOTHING
+        RETURNING, so checking for a collision and inserting cost one round
+        trip and two concurrent creates can't both claim the same code.
         
         Args:
             short_code: The short code for the URL
             original_url: The original URL to shorten
-            expires_at: Optional expiration datetime
+            expires_in_days: Optional expiration in days, computed by the
+                database from its own clock
         
         Returns:
-            URL: Created URL object
+            URL: Created URL object, or None if the short code already exists
         
         Raises:
             DatabaseError: If creation fails
         """
-        try:
-            url = URL(
+        insert = pg_insert if self.db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        stmt = (
+            insert(URL)
+            .values(
                 short_code=short_code,
                 original_url=original_url,
-                expires_at=expires_at,
+                expires_at=utc_days_from_now(expires_in_days) if expires_in_days else None,
                 user_id=user_id,
             )
-            self.db.add(url)
+            .on_conflict_do_nothing(index_elements=[URL.short_code])
+            .returning(URL)
+        )
+        try:
+            url = self.db.scalars(stmt).one_or_none()
             self.db.commit()
-            self.db.refresh(url)
+            if url is not None:
+                invalidate_redirect_cache(short_code)
+                _invalidate_list_count(user_id)
             return url
         except Exception as e:
             self.db.rollback()
@@ -62,18 +192,65 @@ class URLRepository:
         Returns:
             URL if found, None otherwise
         """
-        query = self.db.query(URL).filter(URL.short_code == short_code)
+        # Callers only read the URL's own columns; never lazy-load the owner
+        # or click rows behind their back. Built as a lambda_stmt so the
+        # statement is cached per call site and only short_code is re-bound.
+        # Expiry is checked by the database, so expired rows are never loaded.
+        stmt = lambda_stmt(
+            lambda: select(URL)
+            .options(raiseload(URL.owner), raiseload(URL.analytics))
+            .where(
+                URL.short_code == short_code,
+                or_(URL.expires_at.is_(None), URL.expires_at >= utcnow()),
+            )
+        )
         
         if not include_inactive:
-            query = query.filter(URL.is_active == True)
+            stmt += lambda s: s.where(URL.is_active == True)
         
-        url = query.first()
+        return self.db.execute(stmt).scalar_one_or_none()
+
+    def get_redirect_target(self, short_code: str) -> Optional[tuple[int, str]]:
+        """
+        Get the ID and original URL for an active, unexpired short code.
         
-        # Check expiration
-        if url and url.expires_at and url.expires_at < datetime.utcnow():
-            return None
+        Served from an in-process cache for up to REDIRECT_CACHE_TTL seconds;
+        expiry is re-checked on every hit. Codes with no active URL are
+        remembered for REDIRECT_MISS_CACHE_TTL seconds.
         
-        return url
+        Args:
+            short_code: The short code to look up
+        
+        Returns:
+            Tuple of (URL ID, original URL) if found, None otherwise
+        """
+        with _redirect_cache_lock:
+            cached = _redirect_cache.get(short_code)
+            if cached is None and short_code in _redirect_miss_cache:
+                return None
+        if cached is None:
+            stmt = lambda_stmt(
+                lambda: select(URL.id, URL.original_url, URL.expires_at)
+                .where(URL.short_code == short_code, URL.is_active == True)
+            )
+            row = self.db.execute(stmt).first()
+            if row is None:
+                with _redirect_cache_lock:
+                    _redirect_miss_cache[short_code] = True
+                return None
+            expires_at = row.expires_at
+            cached = (
+                row.id,
+                row.original_url,
+                expires_at.replace(tzinfo=timezone.utc).timestamp() if expires_at else None,
+            )
+            with _redirect_cache_lock:
+                _redirect_cache[short_code] = cached
+        
+        url_id, original_url, expires_at_epoch = cached
+        if expires_at_epoch is not None and expires_at_epoch < time.time():
+            return None
+        return url_id, original_url
 
     def get_by_id(self, url_id: int) -> Optional[URL]:
         """
@@ -85,19 +262,22 @@ class URLRepository:
         Returns:
             URL if found, None otherwise
         """
-        return self.db.query(URL).filter(URL.id == url_id).first()
+        return self.db.execute(_GET_BY_ID, {"url_id": url_id}).scalar_one_or_none()
 
     def check_short_code_exists(self, short_code: str) -> bool:
         """
         Check if a short code already exists.
         
+        URL creation detects collisions in its INSERT; this is for explicit
+        availability checks. The database answers with a single boolean.
+        
         Args:
             short_code: The short code to check
         
         Returns:
             True if exists, False otherwise
         """
-        return self.db.query(URL).filter(URL.short_code == short_code).first() is not None
+        return self.db.scalar(_SHORT_CODE_EXISTS, {"code": short_code})
 
     def increment_click_count(self, url_id: int) -> None:
         """
@@ -110,32 +290,52 @@ class URLRepository:
             DatabaseError: If update fails
         """
         try:
-            url = self.get_by_id(url_id)
-            if url:
-                url.click_count += 1
-                self.db.commit()
+            # Server-side increment: one round trip and no lost updates
+            # between concurrent clicks
+            self.db.execute(
+                update(URL)
+                .where(URL.id == url_id)
+                .values(click_count=URL.click_count + 1)
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
         except Exception as e:
             self.db.rollback()
             raise DatabaseError(f"Failed to increment click count: {str(e)}") from e
 
-    def deactivate(self, url_id: int) -> None:
+    def deactivate_by_short_code(self, short_code: str) -> int:
         """
-        Deactivate a URL.
+        Deactivate a URL with a single UPDATE keyed by short code.
+        
+        Already-inactive URLs still match, so callers can tell "not found"
+        from "nothing to change" without a prior SELECT.
         
         Args:
-            url_id: The URL ID
+            short_code: The short code to deactivate
+        
+        Returns:
+            Number of URLs matched (0 or 1)
         
         Raises:
             DatabaseError: If update fails
         """
         try:
-            url = self.get_by_id(url_id)
-            if url:
-                url.is_active = False
-                self.db.commit()
+            owners = self.db.execute(
+                update(URL)
+                .where(URL.short_code == short_code)
+                .values(is_active=False)
+                .returning(URL.user_id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            self.db.commit()
         except Exception as e:
             self.db.rollback()
             raise DatabaseError(f"Failed to deactivate URL: {str(e)}") from e
+        
+        if owners:
+            invalidate_redirect_cache(short_code)
+            _invalidate_list_count(owners[0])
+        return len(owners)
 
     def list_urls(
         self,
@@ -143,50 +343,217 @@ class URLRepository:
         page_size: int = 20,
         include_inactive: bool = False,
         user_id: Optional[int] = None,
-    ) -> tuple[list[URL], int]:
+        cursor: Optional[tuple[datetime, int]] = None,
+        include_total: bool = True,
+    ) -> tuple[list[dict], Optional[int], Optional[tuple[datetime, int]]]:
         """
-        List URLs with pagination.
+        List URLs, newest first, by page number or keyset cursor.
+        
+        The total is folded into the page query as a COUNT(*) OVER () window,
+        so offset pages cost one round trip. With a cursor the query seeks
+        past the last row seen instead of skipping OFFSET rows, and the
+        total comes from a short-lived per-owner cache.
+        
+        Rows are selected as plain columns, short_url included (concatenated
+        by the database), so no ORM objects are built for a listing.
         
         Args:
-            page: Page number (1-indexed)
+            page: Page number (1-indexed); ignored when a cursor is given
             page_size: Number of items per page
             include_inactive: Whether to include inactive URLs
+            user_id: Optional owner to filter by
+            cursor: (created_at, id) of the last URL on the previous page
+            include_total: Whether to count matching URLs; without it the
+                query is a plain LIMIT and the total is None
         
         Returns:
-            Tuple of (list of URLs, total count)
+            Tuple of (URL dicts shaped like URLResponse, total count or
+            None, cursor for the next page or None)
         """
-        query = self.db.query(URL)
+        base = _user_urls_select(user_id, include_inactive)
+        stmt = base.limit(page_size + 1)
+        if include_total and cursor is None:
+            # Cursor pages take the total from _list_count_cache instead
+            stmt = stmt.add_columns(func.count().over().label("total"))
+        if cursor is not None:
+            created_at, url_id = cursor
+            if self.db.get_bind().dialect.name == "sqlite":
+                # SQLite compares datetimes as text, and CURRENT_TIMESTAMP
+                # omits the fractional seconds a bound datetime carries
+                stmt = stmt.where(
+                    tuple_(func.julianday(URL.created_at), URL.id)
+                    < tuple_(func.julianday(created_at), url_id)
+                )
+            else:
+                stmt = stmt.where(tuple_(URL.created_at, URL.id) < tuple_(created_at, url_id))
+        else:
+            stmt = stmt.offset((page - 1) * page_size)
         
-        if user_id is not None:
-            query = query.filter(URL.user_id == user_id)
+        rows = self.db.execute(stmt).mappings().all()
+        urls = [dict(row) for row in rows[:page_size]]
+        next_cursor = None
+        if len(rows) > page_size:
+            next_cursor = (urls[-1]["created_at"], urls[-1]["id"])
+        if not include_total:
+            return urls, None, next_cursor
         
-        if not include_inactive:
-            query = query.filter(URL.is_active == True)
+        count_key = (user_id, include_inactive)
+        if cursor is None and urls:
+            total = rows[0]["total"]
+            for url in urls:
+                del url["total"]
+            with _list_count_cache_lock:
+                _list_count_cache[count_key] = total
+            return urls, total, next_cursor
         
-        total = query.count()
+        with _list_count_cache_lock:
+            total = _list_count_cache.get(count_key)
+        if total is None:
+            # Past the last page or first cursor request: count separately
+            total = self.db.execute(
+                base.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
+            ).scalar_one()
+            with _list_count_cache_lock:
+                _list_count_cache[count_key] = total
+        return urls, total, next_cursor
+
+    def iter_urls(
+        self,
+        user_id: Optional[int] = None,
+        include_inactive: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[dict]:
+        """
+        Stream URLs, newest first, without loading them all at once.
         
-        offset = (page - 1) * page_size
-        urls = query.order_by(URL.created_at.desc()).offset(offset).limit(page_size).all()
+        Rows are fetched batch_size at a time (yield_per), so memory stays
+        bounded however many URLs match. The session's connection is held
+        until the iterator is exhausted or closed.
         
-        return urls, total
+        Args:
+            user_id: Optional owner to filter by
+            include_inactive: Whether to include inactive URLs
+            batch_size: Rows fetched per round trip
+        
+        Yields:
+            URL dicts shaped like URLResponse
+        """
+        stmt = _user_urls_select(user_id, include_inactive).execution_options(
+            yield_per=batch_size
+        )
+        for row in self.db.execute(stmt).mappings():
+            yield dict(row)
 
-    def delete_expired(self) -> int:
+    def get_top_short_codes(self, limit: int) -> list[str]:
         """
-        Delete expired URLs.
+        Get the short codes of the most-clicked active, unexpired URLs.
+        
+        Args:
+            limit: Number of short codes to return
         
         Returns:
-            Number of URLs deleted
+            Short codes, most clicked first
+        """
+        stmt = (
+            select(URL.short_code)
+            .where(
+                URL.is_active == True,
+                or_(URL.expires_at.is_(None), URL.expires_at >= utcnow()),
+            )
+            .order_by(URL.click_count.desc())
+            .limit(limit)
+        )
+        return list(self.db.execute(stmt).scalars())
+
+    def expire_due(self) -> int:
+        """
+        Mark active URLs whose expiry has passed as inactive.
+        
+        Lookups still check expires_at themselves; this keeps is_active
+        truthful so expired rows drop out of listings and the redirect
+        cache instead of being filtered again on every read.
+        
+        Returns:
+            Number of URLs deactivated
+        
+        Raises:
+            DatabaseError: If update fails
         """
         try:
-            count = self.db.query(URL).filter(
-                and_(
+            expired = self.db.execute(
+                update(URL)
+                .where(
+                    URL.is_active == True,
                     URL.expires_at.isnot(None),
-                    URL.expires_at < datetime.utcnow(),
+                    URL.expires_at < utcnow(),
                 )
-            ).delete(synchronize_session=False)
+                .values(is_active=False)
+                .returning(URL.short_code, URL.user_id)
+                .execution_options(synchronize_session=False)
+            ).all()
             self.db.commit()
-            return count
         except Exception as e:
             self.db.rollback()
-            raise DatabaseError(f"Failed to delete expired URLs: {str(e)}") from e
+            raise DatabaseError(f"Failed to expire URLs: {str(e)}") from e
+        
+        for short_code, user_id in expired:
+            invalidate_redirect_cache(short_code)
+            _invalidate_list_count(user_id)
+        return len(expired)
 
+    def delete_expired(
+        self, batch_size: int = 5000, expired_before: Optional[datetime] = None
+    ) -> int:
+        """
+        Delete expired URLs.
+        
+        Deletes in chunks of batch_size rows, committing after each, so no
+        single transaction holds row locks for the whole sweep. Each chunk's
+        analytics rows are deleted explicitly in the same transaction:
+        SQLite doesn't enforce the ON DELETE CASCADE (foreign keys are off),
+        and url ids get reused, so orphaned clicks would otherwise attach to
+        the next URL created.
+        
+        Args:
+            batch_size: Most URLs deleted per transaction
+            expired_before: Only delete URLs that expired before this naive
+                UTC time. Defaults to the database's current time.
+        
+        Returns:
+            Number of URLs deleted
+        
+        Raises:
+            DatabaseError: If a chunk fails; earlier chunks stay deleted
+        """
+        expired_ids = (
+            select(URL.id)
+            .where(
+                URL.expires_at.isnot(None),
+                URL.expires_at < (expired_before if expired_before is not None else utcnow()),
+            )
+            .order_by(URL.id)
+            .limit(batch_size)
+        )
+        
+        total = 0
+        try:
+            while True:
+                ids = list(self.db.execute(expired_ids).scalars())
+                if ids:
+                    self.db.execute(
+                        delete(Analytics)
+                        .where(Analytics.url_id.in_(ids))
+                        .execution_options(synchronize_session=False)
+                    )
+                    self.db.execute(
+                        delete(URL)
+                        .where(URL.id.in_(ids))
+                        .execution_options(synchronize_session=False)
+                    )
+                self.db.commit()
+                total += len(ids)
+                if len(ids) < batch_size:
+                    return total
+        except Exception as e:
+            self.db.rollback()
+            raise DatabaseError(f"Failed to delete expired URLs: {str(e)}") from e
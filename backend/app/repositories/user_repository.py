@@ -1,6 +1,7 @@
 """Repository for user data access operations."""
 
 from typing import Optional
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from app.models.user import User
@@ -41,8 +42,8 @@ class UserRepository:
                 hashed_password=hashed_password,
             )
             self.db.add(user)
+            # id and created_at come back with the INSERT (eager_defaults)
             self.db.commit()
-            self.db.refresh(user)
             return user
         except Exception as e:
             self.db.rollback()
@@ -58,7 +59,8 @@ class UserRepository:
         Returns:
             User if found, None otherwise
         """
-        return self.db.query(User).filter(User.email == email).first()
+        stmt = lambda_stmt(lambda: select(User).where(User.email == email))
+        return self.db.execute(stmt).scalar_one_or_none()
 
     def get_by_username(self, username: str) -> Optional[User]:
         """
@@ -70,7 +72,8 @@ class UserRepository:
         Returns:
             User if found, None otherwise
         """
-        return self.db.query(User).filter(User.username == username).first()
+        stmt = lambda_stmt(lambda: select(User).where(User.username == username))
+        return self.db.execute(stmt).scalar_one_or_none()
 
     def get_by_id(self, user_id: int) -> Optional[User]:
         """
@@ -82,7 +85,8 @@ class UserRepository:
         Returns:
             User if found, None otherwise
         """
-        return self.db.query(User).filter(User.id == user_id).first()
+        stmt = lambda_stmt(lambda: select(User).where(User.id == user_id))
+        return self.db.execute(stmt).scalar_one_or_none()
 
 
 
@@ -68,8 +68,14 @@ class URLListResponse(BaseModel):
     """Schema for paginated URL list response."""
 
     urls: list[URLResponse]
-    total: int
-    page: int
+    # None when the list was requested with include_total=false
+    total: Optional[int] = None
+    # True on cursor pages, whose total may be briefly stale
+    total_approximate: bool = False
+    # None on cursor pages
+    page: Optional[int] = None
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    has_next: bool = False
+    next_cursor: Optional[str] = None
 
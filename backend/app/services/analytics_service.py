@@ -1,12 +1,122 @@
 """Service layer for analytics business logic."""
 
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
 
-from app.repositories.url_repository import URLRepository
+from app.config import settings
+from app.database import SessionLocal
+from app.models.url import URL
+from app.repositories.url_repository import URLRepository, is_redirect_miss_cached, peek_redirect_target
 from app.repositories.analytics_repository import AnalyticsRepository
 from app.core.exceptions import URLNotFoundError
 
+logger = logging.getLogger(__name__)
+
+# Longest user agent / referer the analytics columns hold
+_MAX_HEADER_LENGTH = 512
+
+
+class ClickBuffer:
+    """
+    In-memory queue of clicks, written to the database in batches.
+    
+    Redirects enqueue a row and return immediately; a background thread
+    inserts the rows and bumps click counters in one transaction per
+    batch. Clicks still queued when the process is killed are lost, which
+    is acceptable for analytics.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        """
+        Initialize the buffer (the flush thread starts with start()).
+        
+        Args:
+            batch_size: Most clicks written per transaction
+            flush_interval: Seconds to wait for more clicks before flushing
+            max_pending: Queue bound; clicks beyond it are dropped
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        """Whether the flush thread is accepting clicks."""
+        return self._thread is not None and not self._stop.is_set()
+
+    def start(self) -> None:
+        """Start the background flush thread."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="click-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop accepting clicks, flush what is queued and wait for the thread."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def put(self, row: dict) -> None:
+        """Queue one click row without blocking."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("Click buffer full; dropping click for url_id=%s", row["url_id"])
+
+    def _run(self) -> None:
+        """Drain the queue until stopped, then flush the remainder."""
+        while not self._stop.is_set():
+            self._flush(self._drain(block=True))
+        while not self._queue.empty():
+            self._flush(self._drain(block=False))
+
+    def _drain(self, block: bool) -> list[dict]:
+        """Take up to batch_size rows, waiting up to flush_interval for the first."""
+        rows = []
+        try:
+            if block:
+                rows.append(self._queue.get(timeout=self.flush_interval))
+            while len(rows) < self.batch_size:
+                rows.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    def _flush(self, rows: list[dict]) -> None:
+        """Write one batch in its own session."""
+        if not rows:
+            return
+        for row in rows:
+            row["clicked_at"] = datetime.utcfromtimestamp(row["clicked_at"])
+        click_counts = Counter(row["url_id"] for row in rows)
+        db = SessionLocal()
+        try:
+            AnalyticsRepository(db).record_clicks(rows, dict(click_counts))
+        except Exception:
+            logger.exception("Failed to flush %d clicks", len(rows))
+        finally:
+            db.close()
+
+
+# Process-wide buffer; started and stopped with the application
+click_buffer = ClickBuffer(
+    batch_size=settings.CLICK_FLUSH_BATCH_SIZE,
+    flush_interval=settings.CLICK_FLUSH_INTERVAL,
+    max_pending=settings.CLICK_BUFFER_MAX_PENDING,
+)
+
 
 class AnalyticsService:
     """Service class for analytics operations."""
@@ -46,16 +156,117 @@ class AnalyticsService:
         if not url:
             raise URLNotFoundError(f"Short code '{short_code}' not found or expired")
         
+        self._record_click(url.id, ip_address, user_agent, referer)
+
+    def resolve_redirect(
+        self,
+        short_code: str,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        referer: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Look up the target of a short code and record the click.
+        
+        Hot codes are resolved from the repository's redirect cache, so the
+        only database work is recording the click. The route needs a single
+        threadpool hop for both.
+        
+        Args:
+            short_code: The short code that was clicked
+            ip_address: IP address of the requester
+            user_agent: User agent string
+            referer: Referer header
+        
+        Returns:
+            The original URL, or None if the code is missing, inactive or expired
+        """
+        target = self.url_repository.get_redirect_target(short_code)
+        
+        if not target:
+            return None
+        
+        url_id, original_url = target
+        self._record_click(url_id, ip_address, user_agent, referer)
+        return original_url
+
+    def resolve_cached_redirect(
+        self,
+        short_code: str,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None,
+        referer: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Resolve a redirect from the cache alone, without blocking.
+        
+        Safe to call on the event loop: a hit only reads the in-process
+        cache and queues the click on the background buffer, and a code
+        recently found missing is rejected from the miss cache. Returns None
+        when the code isn't cached or the buffer is not running; callers
+        then fall back to resolve_redirect on a worker thread.
+        
+        Args:
+            short_code: The short code that was clicked
+            ip_address: IP address of the requester
+            user_agent: User agent string
+            referer: Referer header
+        
+        Returns:
+            The original URL, or None if it can't be resolved without the database
+        
+        Raises:
+            URLNotFoundError: If the code is remembered as having no active URL
+        """
+        if is_redirect_miss_cached(short_code):
+            raise URLNotFoundError(f"Short code '{short_code}' not found or expired")
+        
+        if not click_buffer.running:
+            return None
+        
+        target = peek_redirect_target(short_code)
+        if not target:
+            return None
+        
+        url_id, original_url = target
+        self._record_click(url_id, ip_address, user_agent, referer)
+        return original_url
+
+    def _record_click(
+        self,
+        url_id: int,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        referer: Optional[str],
+    ) -> None:
+        """
+        Record a click, via the background buffer when it is running.
+        
+        Outside the application (scripts, shells) the buffer is not started,
+        so the click is written immediately with this service's session.
+        """
+        if click_buffer.running:
+            click_buffer.put({
+                "url_id": url_id,
+                # Wall-clock seconds; cheaper than a datetime on the request
+                # path, converted when the batch is written
+                "clicked_at": time.time(),
+                "ip_address": ip_address,
+                "user_agent": user_agent[:_MAX_HEADER_LENGTH] if user_agent else user_agent,
+                "referer": referer[:_MAX_HEADER_LENGTH] if referer else referer,
+            })
+            return
+        
         # Create analytics record
         self.analytics_repository.create(
-            url_id=url.id,
+            url_id=url_id,
             ip_address=ip_address,
             user_agent=user_agent,
             referer=referer,
         )
         
         # Increment click count
-        self.url_repository.increment_click_count(url.id)
+        self.url_repository.increment_click_count(url_id)
 
     def get_analytics_summary(self, short_code: str) -> dict:
         """
@@ -75,17 +286,29 @@ class AnalyticsService:
         if not url:
             raise URLNotFoundError(f"Short code '{short_code}' not found")
         
-        clicks_by_date = self.analytics_repository.get_click_count_by_date(url.id)
-        unique_ips = self.analytics_repository.get_unique_ip_count(url.id)
-        top_referers = self.analytics_repository.get_top_referers(url.id)
-        clicks_by_hour = self.analytics_repository.get_clicks_by_hour(url.id)
+        return self.get_analytics_summary_for_url(url)
+
+    def get_analytics_summary_for_url(self, url: URL) -> dict:
+        """
+        Get analytics summary for an already-loaded URL.
+        
+        Lets callers that have fetched the URL (e.g. for an ownership check)
+        skip a second lookup by short code.
+        
+        Args:
+            url: The URL to get analytics for
+        
+        Returns:
+            Dictionary with analytics summary
+        """
+        bundle = self.analytics_repository.get_analytics_bundle(url.id)
         
         return {
             "total_clicks": url.click_count,
-            "unique_ips": unique_ips,
-            "clicks_by_date": clicks_by_date,
-            "top_referers": top_referers,
-            "clicks_by_hour": clicks_by_hour,
+            "unique_ips": bundle["unique_ips"],
+            "clicks_by_date": bundle["clicks_by_date"],
+            "top_referers": bundle["top_referers"],
+            "clicks_by_hour": bundle["clicks_by_hour"],
         }
 
     def get_recent_clicks(self, short_code: str, limit: int = 50) -> list[dict]:
@@ -107,17 +330,18 @@ class AnalyticsService:
         if not url:
             raise URLNotFoundError(f"Short code '{short_code}' not found")
         
-        analytics = self.analytics_repository.get_by_url_id(url.id, limit=limit)
-        
-        return [
-            {
-                "id": a.id,
-                "url_id": a.url_id,
-                "clicked_at": a.clicked_at,
-                "ip_address": a.ip_address,
-                "user_agent": a.user_agent,
-                "referer": a.referer,
-            }
-            for a in analytics
-        ]
+        return self.get_recent_clicks_for_url(url, limit=limit)
+
+    def get_recent_clicks_for_url(self, url: URL, limit: int = 50) -> list[dict]:
+        """
+        Get recent click records for an already-loaded URL.
+        
+        Args:
+            url: The URL to get clicks for
+            limit: Maximum number of records to return
+        
+        Returns:
+            List of click records
+        """
+        return self.analytics_repository.get_recent_clicks(url.id, limit=limit)
 
@@ -33,10 +33,11 @@ class AuthService:
         Args:
             email: User email
             username: Username
-            password: Plain text password (truncation handled in hashing function)
+            password: Plain text password
         
         Returns:
-            Dictionary with user information and access token
+            Dictionary with user information and access token, matching the
+            Token schema (routes build the response with model_construct)
         
         Raises:
             ValueError: If email or username already exists
@@ -49,7 +50,7 @@ class AuthService:
         if self.user_repository.get_by_username(username):
             raise ValueError("Username already taken")
         
-        # Hash password (truncation to 72 bytes handled internally by get_password_hash)
+        # Hash password (argon2id, full length)
         hashed_password = get_password_hash(password)
         
         # Create user
@@ -84,15 +85,16 @@ class AuthService:
         
         Args:
             username: Username
-            password: Plain text password (truncation handled in authenticate_user)
+            password: Plain text password
         
         Returns:
-            Dictionary with user information and access token
+            Dictionary with user information and access token, matching the
+            Token schema (routes build the response with model_construct)
         
         Raises:
             ValueError: If credentials are invalid
         """
-        # Authenticate user (password truncation handled internally by authenticate_user)
+        # Authenticate user
         user = authenticate_user(self.db, username, password)
         
         if not user:
@@ -1,9 +1,66 @@
 import io
 import base64
+from functools import lru_cache
+
 import qrcode
+from PIL import Image
 from qrcode.constants import ERROR_CORRECT_L, ERROR_CORRECT_M, ERROR_CORRECT_Q, ERROR_CORRECT_H
 
 
+# Cache sizes bound memory per worker. A module matrix is ~1.7 KB for a
+# short URL and ~19 KB at the 2048-character limit; a PNG is ~0.7 KB at the
+# default 400 px and up to ~22 KB for a long URL at 1000 px. Matrices are
+# reused across sizes, so more are kept (<= ~19 MB worst case); PNGs only
+# need to cover the hot set, which QR_PREWARM_COUNT (100) fills at startup,
+# so 256 leaves headroom for other sizes (<= ~6 MB worst case).
+_QR_MODULES_CACHE_SIZE = 1024
+_QR_PNG_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=_QR_MODULES_CACHE_SIZE)
+def _qr_modules(url: str, error_correction: int, border: int) -> tuple[int, bytes]:
+    """
+    Build a QR code's module matrix, one grayscale byte per module.
+    
+    Encoding is the pure-Python, size-independent part of rendering, so it
+    is memoized on its own: other sizes of the same link reuse it.
+    
+    Returns:
+        (modules per side including the border, row-major pixel bytes)
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        border=border,
+    )
+    
+    qr.add_data(url)
+    qr.make(fit=True)
+    
+    matrix = qr.get_matrix()  # includes the border
+    return len(matrix), b"".join(bytes(0 if dark else 255 for dark in row) for row in matrix)
+
+
+@lru_cache(maxsize=_QR_PNG_CACHE_SIZE)
+def _render_qr_png(url: str, box_size: int, error_correction: int, border: int) -> bytes:
+    """
+    Render a QR code PNG.
+    
+    Output depends only on the arguments, so results are memoized: repeat
+    requests for the same link skip matrix generation and PNG encoding.
+    The image is built at one pixel per module and scaled up by PIL in C,
+    which matches qrcode's per-module drawing pixel for pixel.
+    """
+    modules, pixels = _qr_modules(url, error_correction, border)
+    img = Image.frombytes("L", (modules, modules), pixels).convert("1")
+    img = img.resize((modules * box_size, modules * box_size), Image.NEAREST)
+    
+    # convert to bytes; getvalue() hands back the buffer without a seek/read
+    img_bytes = io.BytesIO()
+    img.save(img_bytes, format="PNG")
+    return img_bytes.getvalue()
+
+
 class QRService:
     
     ERROR_CORRECTION_MAP = {
@@ -41,6 +98,14 @@ class QRService:
         if len(url) > 2048:
             raise ValueError("URL exceeds maximum length of 2048 characters")
         
+        # Most requests use the defaults, which are known to be valid
+        # (box size 400 // 25 = 16)
+        if size == 400 and border == 4 and error_correction in ("M", "m"):
+            try:
+                return _render_qr_png(url, 16, ERROR_CORRECT_M, 4)
+            except Exception as e:
+                raise ValueError(f"Failed to generate QR code: {str(e)}") from e
+        
         if not isinstance(size, int) or not (100 <= size <= 1000):
             raise ValueError("Size must be an integer between 100 and 1000")
         
@@ -55,24 +120,7 @@ class QRService:
         box_size = max(1, size // 25)
         
         try:
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=box_size,
-                border=border,
-            )
-            
-            qr.add_data(url)
-            qr.make(fit=True)
-            
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # convert to bytes 
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-
-            return img_bytes.getvalue()
+            return _render_qr_png(url, box_size, error_correction_code, border)
         
         except Exception as e:
             raise ValueError(f"Failed to generate QR code: {str(e)}") from e
@@ -89,4 +137,4 @@ class QRService:
             border: The border size
         """
         img_bytes = self.generate_qr_code(url, size, error_correction, border)
-        return base64.b64encode(img_bytes).decode("utf-8")
\ No newline at end of file
+        return base64.b64encode(img_bytes).decode("utf-8")
@@ -1,19 +1,214 @@
 """Service layer for URL shortening business logic."""
 
-from datetime import datetime, timedelta
-from typing import Optional
+import base64
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, Optional
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 
-from app.repositories.url_repository import URLRepository
+from app.database import SessionLocal
+from app.repositories.url_repository import SHORT_URL_PREFIX, URLRepository
+from app.services.qr_service import QRService
 from app.core.security import generate_short_code, validate_url
 from app.core.exceptions import (
+    InvalidCursorError,
     InvalidURLError,
     ShortCodeGenerationError,
     URLNotFoundError,
 )
 from app.config import settings
+from app.models.url import URL
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
+# Cache of get_url_stats results keyed by short code. Each worker process
+# keeps its own copy, and deactivation only clears the worker that handled
+# it, so others may serve the URL (info and QR) as active, and click counts
+# that lag, for up to URL_CACHE_TTL seconds. Keep that TTL short.
+_url_stats_cache: TTLCache = TTLCache(
+    maxsize=settings.URL_CACHE_SIZE, ttl=settings.URL_CACHE_TTL
+)
+_url_stats_cache_lock = threading.Lock()
+
+
+def _to_epoch(value: Optional[datetime]) -> Optional[float]:
+    """Convert a naive UTC datetime to a Unix timestamp."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _url_to_dict(url: URL) -> dict:
+    """Shape a URL row like URLResponse (list_urls does the same in SQL)."""
+    return {
+        "id": url.id,
+        "short_code": url.short_code,
+        "original_url": url.original_url,
+        "short_url": SHORT_URL_PREFIX + url.short_code,
+        "created_at": url.created_at,
+        "expires_at": url.expires_at,
+        "is_active": url.is_active,
+        "click_count": url.click_count,
+    }
+
+
+def encode_cursor(key: tuple[datetime, int]) -> str:
+    """Encode a list_urls keyset (created_at, id) as an opaque cursor string."""
+    created_at, url_id = key
+    raw = f"{created_at.isoformat()}|{url_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+    
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, url_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(url_id)
+    except ValueError as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+
+def invalidate_url_cache(short_code: str) -> None:
+    """Drop any cached lookup for a short code."""
+    with _url_stats_cache_lock:
+        _url_stats_cache.pop(short_code, None)
+
+
+def prewarm_qr_codes(limit: int) -> int:
+    """
+    Render default-size QR codes for the most-clicked URLs.
+    
+    Fills the QR render cache so the first scans after a restart don't pay
+    for encoding. Meant to run on a background thread at startup.
+    
+    Args:
+        limit: Number of URLs to render
+    
+    Returns:
+        Number of QR codes rendered
+    """
+    db = SessionLocal()
+    try:
+        short_codes = URLRepository(db).get_top_short_codes(limit)
+    finally:
+        db.close()
+    
+    qr_service = QRService()
+    for short_code in short_codes:
+        # Same arguments the QR route uses for its defaults
+        qr_service.generate_qr_code(SHORT_URL_PREFIX + short_code)
+    return len(short_codes)
+
+
+def _prewarm_qr_codes_logged(limit: int) -> None:
+    """Run prewarm_qr_codes, logging instead of raising."""
+    try:
+        count = prewarm_qr_codes(limit)
+        logger.info("Pre-rendered %d QR codes", count)
+    except Exception:
+        logger.exception("Failed to pre-render QR codes")
+
+
+def start_qr_prewarm() -> None:
+    """Pre-render QR codes on a daemon thread, if QR_PREWARM_COUNT allows."""
+    if settings.QR_PREWARM_COUNT <= 0:
+        return
+    threading.Thread(
+        target=_prewarm_qr_codes_logged,
+        args=(settings.QR_PREWARM_COUNT,),
+        name="qr-prewarm",
+        daemon=True,
+    ).start()
+
+
+class ExpirySweeper:
+    """
+    Background thread that periodically marks expired URLs inactive.
+    
+    With a retention period it also deletes URLs, and their clicks, that
+    expired longer ago than that. Every worker runs its own;
+    both statements are idempotent, so overlapping passes only cost extra
+    queries. Stats cached in other workers still re-check expiry on every
+    hit.
+    """
+
+    def __init__(self, interval: float, retention_days: Optional[int] = None):
+        """
+        Initialize the sweeper (the thread starts with start()).
+        
+        Args:
+            interval: Seconds between sweeps; 0 or less disables it
+            retention_days: Days to keep expired URLs before deleting them;
+                None never deletes
+        """
+        self.interval = interval
+        self.retention_days = retention_days
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start the sweep thread, unless disabled or already running."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="url-expiry", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the sweep thread and wait for it to exit."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """Sweep every interval seconds until stopped."""
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Run one sweep in its own session, logging instead of raising.
+        
+        Returns:
+            Number of URLs marked inactive
+        """
+        db = SessionLocal()
+        try:
+            repository = URLRepository(db)
+            count = repository.expire_due()
+            if count:
+                logger.info("Marked %d expired URLs inactive", count)
+            if self.retention_days is not None:
+                cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+                deleted = repository.delete_expired(expired_before=cutoff)
+                if deleted:
+                    logger.info("Deleted %d URLs expired before %s", deleted, cutoff)
+        except Exception:
+            logger.exception("Failed to sweep expired URLs")
+            return 0
+        finally:
+            db.close()
+        return count
+
+
+# Process-wide sweeper; started and stopped with the application
+expiry_sweeper = ExpirySweeper(
+    interval=settings.URL_EXPIRY_SWEEP_INTERVAL,
+    retention_days=settings.EXPIRED_URL_RETENTION_DAYS,
+)
+
 
 class URLService:
     """Service class for URL shortening operations."""
@@ -44,7 +239,8 @@ class URLService:
             expires_in_days: Optional expiration in days
         
         Returns:
-            Dictionary with URL information
+            Dictionary with URL information, matching the URLResponse schema
+            exactly (routes build the response with model_construct)
         
         Raises:
             InvalidURLError: If URL is invalid
@@ -53,96 +249,98 @@ class URLService:
         # Validate and normalize URL
         normalized_url = validate_url(original_url)
         
-        # Determine short code
+        # Create URL record (associate with user if authenticated). The
+        # insert itself detects collisions, so there is no separate lookup,
+        # and computes expires_at from the database clock.
+        user_id = user.id if user else None
         if custom_code:
-            # Validate custom code doesn't exist
-            if self.url_repository.check_short_code_exists(custom_code):
+            url = self.url_repository.create(
+                short_code=custom_code,
+                original_url=normalized_url,
+                expires_in_days=expires_in_days,
+                user_id=user_id,
+            )
+            if url is None:
                 raise ShortCodeGenerationError(f"Short code '{custom_code}' already exists")
-            short_code = custom_code
         else:
             # Generate unique short code
             max_attempts = 10
             for _ in range(max_attempts):
-                short_code = generate_short_code()
-                if not self.url_repository.check_short_code_exists(short_code):
+                url = self.url_repository.create(
+                    short_code=generate_short_code(),
+                    original_url=normalized_url,
+                    expires_in_days=expires_in_days,
+                    user_id=user_id,
+                )
+                if url is not None:
                     break
             else:
                 raise ShortCodeGenerationError("Failed to generate unique short code")
+        invalidate_url_cache(url.short_code)
         
-        # Calculate expiration
-        expires_at = None
-        if expires_in_days:
-            expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
-        
-        # Create URL record (associate with user if authenticated)
-        url = self.url_repository.create(
-            short_code=short_code,
-            original_url=normalized_url,
-            expires_at=expires_at,
-            user_id=user.id if user else None,
-        )
-        
-        return {
-            "id": url.id,
-            "short_code": url.short_code,
-            "original_url": url.original_url,
-            "short_url": f"{settings.BASE_URL}/{url.short_code}",
-            "created_at": url.created_at,
-            "expires_at": url.expires_at,
-            "is_active": url.is_active,
-            "click_count": url.click_count,
-        }
+        return _url_to_dict(url)
 
-    def get_original_url(self, short_code: str) -> str:
+    def get_url_stats(self, short_code: str) -> dict:
         """
-        Get original URL by short code.
+        Get statistics for a shortened URL.
+        
+        Results are served from an in-process cache for up to URL_CACHE_TTL
+        seconds; expired entries are never returned. The returned dict is
+        shared with the cache and must not be mutated.
         
         Args:
-            short_code: The short code to look up
+            short_code: The short code to get stats for
         
         Returns:
-            Original URL string
+            Dictionary with URL statistics, shaped exactly like URLResponse
         
         Raises:
-            URLNotFoundError: If URL is not found or expired
+            URLNotFoundError: If URL is not found
         """
-        url = self.url_repository.get_by_short_code(short_code)
-        
-        if not url:
-            raise URLNotFoundError(f"Short code '{short_code}' not found or expired")
-        
-        return url.original_url
+        return self.get_url_stats_with_expiry(short_code)[0]
 
-    def get_url_stats(self, short_code: str) -> dict:
+    def get_url_stats_with_expiry(self, short_code: str) -> tuple[dict, Optional[float]]:
         """
-        Get statistics for a shortened URL.
+        Get URL statistics together with the expiry as a Unix timestamp.
         
         Args:
             short_code: The short code to get stats for
         
         Returns:
-            Dictionary with URL statistics
+            Tuple of (stats dict as returned by get_url_stats, expiry epoch or None)
         
         Raises:
             URLNotFoundError: If URL is not found
         """
+        with _url_stats_cache_lock:
+            cached = _url_stats_cache.get(short_code)
+        if cached is not None:
+            expires_at_epoch = cached[1]
+            if expires_at_epoch is None or expires_at_epoch >= time.time():
+                return cached
+            invalidate_url_cache(short_code)
+        
         url = self.url_repository.get_by_short_code(short_code, include_inactive=True)
         
         if not url:
             raise URLNotFoundError(f"Short code '{short_code}' not found")
         
-        return {
-            "id": url.id,
-            "short_code": url.short_code,
-            "original_url": url.original_url,
-            "short_url": f"{settings.BASE_URL}/{url.short_code}",
-            "created_at": url.created_at,
-            "expires_at": url.expires_at,
-            "is_active": url.is_active,
-            "total_clicks": url.click_count,
-        }
+        stats = _url_to_dict(url)
+        stats["qr_code"] = None
+        # Expiry precomputed so hot callers can compare against time.time()
+        entry = (stats, _to_epoch(url.expires_at))
+        with _url_stats_cache_lock:
+            _url_stats_cache[short_code] = entry
+        return entry
 
-    def list_urls(self, page: int = 1, page_size: int = 20, user: Optional[User] = None) -> dict:
+    def list_urls(
+        self,
+        page: int = 1,
+        page_size: int = 20,
+        user: Optional[User] = None,
+        cursor: Optional[str] = None,
+        include_total: bool = True,
+    ) -> dict:
         """
         List URLs with pagination.
         If user is provided, only returns URLs owned by that user.
@@ -151,37 +349,62 @@ class URLService:
             page: Page number (1-indexed)
             page_size: Number of items per page
             user: Optional user to filter URLs by
+            cursor: Optional next_cursor from a previous page; seeks instead
+                of using page, which keeps deep pages as cheap as the first
+            include_total: Whether to count matching URLs; when False,
+                total and total_pages are None and has_next is the only
+                paging hint, saving the count
+        
+        Cursor pages report page as None, since they don't correspond to a
+        page number, and mark total as approximate: it comes from a
+        per-worker count cache and may be up to URL_LIST_COUNT_CACHE_TTL
+        seconds old.
         
         Returns:
             Dictionary with paginated URL list
+        
+        Raises:
+            InvalidCursorError: If the cursor is malformed
         """
         user_id = user.id if user else None
-        urls, total = self.url_repository.list_urls(page=page, page_size=page_size, user_id=user_id)
-        
-        total_pages = (total + page_size - 1) // page_size if total > 0 else 0
-        
-        url_responses = [
-            {
-                "id": url.id,
-                "short_code": url.short_code,
-                "original_url": url.original_url,
-                "short_url": f"{settings.BASE_URL}/{url.short_code}",
-                "created_at": url.created_at,
-                "expires_at": url.expires_at,
-                "is_active": url.is_active,
-                "click_count": url.click_count,
-            }
-            for url in urls
-        ]
+        key = decode_cursor(cursor) if cursor else None
+        urls, total, next_key = self.url_repository.list_urls(
+            page=page,
+            page_size=page_size,
+            user_id=user_id,
+            cursor=key,
+            include_total=include_total,
+        )
+        
+        total_pages = None
+        if total is not None:
+            total_pages = (total + page_size - 1) // page_size if total > 0 else 0
         
         return {
-            "urls": url_responses,
+            # Already shaped like URLResponse by the repository
+            "urls": urls,
             "total": total,
-            "page": page,
+            "total_approximate": key is not None and total is not None,
+            "page": None if key is not None else page,
             "page_size": page_size,
             "total_pages": total_pages,
+            "has_next": next_key is not None,
+            "next_cursor": encode_cursor(next_key) if next_key else None,
         }
 
+    def iter_urls(self, user: Optional[User] = None) -> Iterator[dict]:
+        """
+        Stream every URL visible in list_urls, newest first.
+        
+        Args:
+            user: Optional user to filter URLs by
+        
+        Yields:
+            URL dicts shaped like URLResponse
+        """
+        user_id = user.id if user else None
+        yield from self.url_repository.iter_urls(user_id=user_id)
+
     def deactivate_url(self, short_code: str) -> None:
         """
         Deactivate a shortened URL.
@@ -192,10 +415,15 @@ class URLService:
         Raises:
             URLNotFoundError: If URL is not found
         """
-        url = self.url_repository.get_by_short_code(short_code, include_inactive=True)
-        
-        if not url:
+        if not self.url_repository.deactivate_by_short_code(short_code):
             raise URLNotFoundError(f"Short code '{short_code}' not found")
-        
-        self.url_repository.deactivate(url.id)
+        invalidate_url_cache(short_code)
 
+    def deactivate_url_obj(self, url: URL) -> None:
+        """
+        Deactivate an already-loaded URL without looking it up again.
+        
+        Args:
+            url: The URL to deactivate
+        """
+        self.deactivate_url(url.short_code)
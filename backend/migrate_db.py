@@ -1,21 +1,55 @@
 """Database migration script to add user_id column to urls table."""
 
-from sqlalchemy import text
+from sqlalchemy import event, text
 from app.database import engine, Base
 from app.models.user import User
 from app.models.url import URL
 from app.models.analytics import Analytics
 
+if engine.dialect.name == "sqlite":
+    # pysqlite never emits BEGIN before DDL, so ALTER TABLE and CREATE TABLE
+    # would autocommit one by one. Take over transaction control (SQLAlchemy's
+    # pysqlite recipe) so engine.begin() really wraps them. Only this script
+    # imports the hooks; the application's engine keeps the driver default.
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+# Bump when migrate_database learns a new step, so databases stamped with an
+# older version run it again. 2: drops idx_short_code_active.
+SCHEMA_VERSION = 2
+
 def migrate_database():
-    """Add user_id column to urls table if it doesn't exist."""
-    with engine.connect() as conn:
-        # Check if user_id column exists
+    """
+    Add user_id column to urls table if it doesn't exist.
+    
+    Also drops the redundant idx_short_code_active index. Runs as one
+    transaction (see the BEGIN hooks above), stamp included, so a failure
+    leaves neither half-applied DDL nor a version behind. The engine's
+    connect hook has already switched the file to WAL. A database stamped
+    with SCHEMA_VERSION in _schema_meta is skipped without any catalog
+    queries.
+    """
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE IF NOT EXISTS _schema_meta (version INTEGER NOT NULL)"))
+        version = conn.execute(text("SELECT MAX(version) FROM _schema_meta")).scalar()
+        if version == SCHEMA_VERSION:
+            print(f"✓ Schema already at version {SCHEMA_VERSION}")
+            return
+        
+        # One catalog read covers both checks: the stored CREATE TABLE text
+        # shows whether user_id exists (ADD COLUMN rewrites it)
         result = conn.execute(text("""
-            SELECT COUNT(*) as count 
-            FROM pragma_table_info('urls') 
-            WHERE name='user_id'
+            SELECT name, sql FROM sqlite_master 
+            WHERE type='table' AND name IN ('urls', 'users')
         """))
-        column_exists = result.scalar() > 0
+        table_sql = {name: sql or "" for name, sql in result}
+        column_exists = "user_id" in table_sql.get("urls", "")
+        users_table_exists = "users" in table_sql
         
         if not column_exists:
             print("Adding user_id column to urls table...")
@@ -23,27 +57,81 @@ def migrate_database():
             conn.execute(text("ALTER TABLE urls ADD COLUMN user_id INTEGER"))
             # Add foreign key constraint (SQLite doesn't support adding FK after table creation easily)
             # But we can at least add the column
-            conn.commit()
-            print("✓ user_id column added successfully")
+            print("✓ user_id column added")
         else:
             print("✓ user_id column already exists")
         
-        # Check if users table exists, if not create all tables
-        result = conn.execute(text("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='users'
-        """))
-        users_table_exists = result.first() is not None
-        
         if not users_table_exists:
             print("Creating users table...")
-            Base.metadata.create_all(bind=engine)
-            print("✓ All tables created successfully")
+            Base.metadata.create_all(bind=conn)
+            print("✓ All tables created")
         else:
             print("✓ Users table already exists")
+        
+        conn.execute(text("DROP INDEX IF EXISTS idx_short_code_active"))
+        print("✓ idx_short_code_active dropped")
+        
+        conn.execute(text("DELETE FROM _schema_meta"))
+        conn.execute(
+            text("INSERT INTO _schema_meta (version) VALUES (:version)"),
+            {"version": SCHEMA_VERSION},
+        )
+    print(f"✓ Migration committed (schema version {SCHEMA_VERSION})")
+
+def migrate_ip_address_to_inet():
+    """Convert analytics.ip_address from text to INET on PostgreSQL."""
+    with engine.connect() as conn:
+        data_type = conn.execute(text("""
+            SELECT data_type
+            FROM information_schema.columns
+            WHERE table_name = 'analytics' AND column_name = 'ip_address'
+        """)).scalar()
+        
+        if data_type is None or data_type == "inet":
+            print("✓ analytics.ip_address is already INET")
+            return
+        
+        print("Converting analytics.ip_address to INET...")
+        # Rewrites the table; values that are not addresses become NULL
+        conn.execute(text("""
+            ALTER TABLE analytics ALTER COLUMN ip_address TYPE INET
+            USING CASE
+                WHEN ip_address ~ '^[0-9.]+$|^[0-9A-Fa-f:.]*:[0-9A-Fa-f:.]*$' THEN ip_address::inet
+            END
+        """))
+        conn.commit()
+        print("✓ analytics.ip_address converted")
+
+def migrate_url_lookup_index():
+    """Replace the old short-code covering index on PostgreSQL."""
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS idx_urls_code_covering"))
+        for index in URL.__table__.indexes:
+            if index.name == "idx_urls_code_active_exp":
+                index.create(bind=conn, checkfirst=True)
+        conn.commit()
+        print("✓ idx_urls_code_active_exp is in place")
+
+def drop_redundant_short_code_index():
+    """
+    Drop the (short_code, is_active) index on PostgreSQL.
+    
+    The unique index on short_code serves those lookups. SQLite drops it
+    as a versioned step of migrate_database instead.
+    """
+    with engine.connect() as conn:
+        conn.execute(text("DROP INDEX IF EXISTS idx_short_code_active"))
+        conn.commit()
+        print("✓ idx_short_code_active dropped")
 
 if __name__ == "__main__":
-    migrate_database()
+    if engine.dialect.name == "postgresql":
+        migrate_ip_address_to_inet()
+        migrate_url_lookup_index()
+        drop_redundant_short_code_index()
+    else:
+        # Versioned; includes the index drop
+        migrate_database()
     print("\nMigration complete!")
 
 
@@ -0,0 +1,65 @@
+"""Tests for URLRepository."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from app.models.analytics import Analytics
+from app.models.url import URL
+from app.repositories.analytics_repository import AnalyticsRepository
+from app.repositories.url_repository import URLRepository
+
+
+def _expire(db, url_id: int, days_ago: int) -> None:
+    db.execute(
+        update(URL)
+        .where(URL.id == url_id)
+        .values(expires_at=datetime.utcnow() - timedelta(days=days_ago))
+    )
+    db.commit()
+
+
+def _click_count(db, url_id: int) -> int:
+    return db.scalar(select(func.count()).select_from(Analytics).where(Analytics.url_id == url_id))
+
+
+def test_delete_expired_removes_clicks(db):
+    repository = URLRepository(db)
+    expired = repository.create("expired1", "https://expired.example")
+    kept = repository.create("kept0001", "https://kept.example")
+    analytics = AnalyticsRepository(db)
+    analytics.create(expired.id)
+    analytics.create(kept.id)
+    _expire(db, expired.id, days_ago=1)
+    
+    assert repository.delete_expired() == 1
+    
+    assert _click_count(db, expired.id) == 0
+    assert _click_count(db, kept.id) == 1
+    # The freed id must not inherit the deleted URL's click history
+    reused = repository.create("reused01", "https://reused.example")
+    assert _click_count(db, reused.id) == 0
+
+
+def test_delete_expired_in_chunks(db):
+    repository = URLRepository(db)
+    analytics = AnalyticsRepository(db)
+    for i in range(5):
+        url = repository.create(f"chunk{i:03d}", f"https://chunk.example/{i}")
+        analytics.create(url.id)
+        _expire(db, url.id, days_ago=1)
+    
+    assert repository.delete_expired(batch_size=2) == 5
+    assert db.scalar(select(func.count()).select_from(Analytics)) == 0
+
+
+def test_delete_expired_respects_cutoff(db):
+    repository = URLRepository(db)
+    old = repository.create("old00001", "https://old.example")
+    recent = repository.create("recent01", "https://recent.example")
+    _expire(db, old.id, days_ago=40)
+    _expire(db, recent.id, days_ago=2)
+    
+    cutoff = datetime.utcnow() - timedelta(days=30)
+    assert repository.delete_expired(expired_before=cutoff) == 1
+    assert db.scalars(select(URL.short_code)).all() == ["recent01"]